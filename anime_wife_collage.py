@@ -1,179 +1,561 @@
+import hashlib
+import io
 import json
 import os
 import time
-from typing import List, Set  # Dict未使用，故去除，不影响整体效果
+from typing import Dict, List, Optional, Set, Tuple
 
 from PIL import Image, ImageDraw, ImageOps
 
+from .gallery_manifest import MANIFEST_NAME, GalleryManifest, image_fingerprint
+from .group_store import get_group_store
+from .persistence import FileLock, atomic_write_bytes, encode_json
+from .raw_atlas import (
+    RAW_ATLAS_EXT,
+    forget_raw_atlas,
+    is_raw_atlas,
+    open_raw_atlas,
+    save_raw_atlas,
+)
+from .thumbnail_store import ThumbnailStore, get_thumbnail_store
+from .wife_catalog import CatalogSnapshot, get_wife_catalog
+
 # 最大保留天数
 MAX_GALLERY_AGE = 7  # 保留7天内的图鉴
 
+# 通用彩色 / 黑白大图文件名（与图鉴清单放在同一目录）
+COMMON_COLOR_GALLERY_NAME = "common_color_gallery.png"
+COMMON_BW_GALLERY_NAME = "common_bw_gallery.png"
+# 更新通用大图时使用的文件锁（多个渲染进程共用同一份大图）
+COMMON_GALLERY_LOCK_NAME = "common_gallery.lock"
+
+# 通用大图的存储格式："raw" 为可内存映射的原始像素文件（读取免解压），"png" 为压缩图片
+ATLAS_FORMAT = "raw"
+
+# 图鉴输出编码：
+# format 可选 "PNG" / "JPEG" / "WEBP"，JPEG 与 WEBP 编码更快、文件更小；
+# quality 用于 JPEG / WEBP（lossless 为 True 时 WEBP 无损）；
+# compress_level（0-9）用于 PNG，数值越小编码越快、文件越大；
+# optimize 额外做一遍压缩优化；progressive 仅用于 JPEG
+GALLERY_ENCODER = {
+    "format": "PNG",
+    "quality": 85,
+    "lossless": False,
+    "optimize": False,
+    "compress_level": 6,
+    "progressive": False,
+}
+_ENCODER_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+# 缩略图仓库目录名（与图片目录同级）
+THUMBNAIL_DIR_NAME = "thumbnails"
+
+# 群图鉴顶部标题栏高度
+TITLE_FONT_SIZE = 16
+TITLE_HEIGHT = TITLE_FONT_SIZE + 10
+
+# 通用彩色大图路径 -> 最近一次核对时的图片目录索引版本，目录未变化时跳过逐个 stat
+_atlas_checked_versions: Dict[str, int] = {}
+
 
 def get_all_wife_images(img_dir: str) -> List[str]:
-    """获取所有二次元老婆图片文件名"""
-    if os.path.exists(img_dir):
-        image_extensions = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
-        return [f for f in os.listdir(img_dir) if f.lower().endswith(image_extensions)]
-    return []
+    """获取所有二次元老婆图片文件名（按文件名排序）"""
+    return list(get_wife_catalog(img_dir).checked_snapshot().names)
 
 
 def get_unlocked_wives(group_id: str, config_dir: str) -> Set[str]:
     """获取指定群组中所有已解锁的老婆图片名"""
-    unlocked = set()
-    config_file = os.path.join(config_dir, f"{group_id}.json")
+    return get_group_store(config_dir).get_unlocked_wives(group_id)
+
+
+def render_thumbnail(img_path: str, thumbnail_size: tuple = (80, 80)) -> Image.Image:
+    """将图片处理为固定尺寸、白色背景的 RGB 缩略图"""
+    with Image.open(img_path) as img:
+        # 处理透明背景
+        if img.mode in ("RGBA", "LA"):
+            background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode == "P":
+            img = img.convert("RGB")
+
+        # 缩放图片
+        img.thumbnail(thumbnail_size)
+
+        # 创建固定尺寸的缩略图
+        thumb = Image.new("RGB", thumbnail_size, (255, 255, 255))
+        offset = (
+            (thumbnail_size[0] - img.width) // 2,
+            (thumbnail_size[1] - img.height) // 2,
+        )
+        thumb.paste(img, offset)
+        return thumb
 
-    if os.path.exists(config_file):
-        with open(config_file, "r", encoding="utf-8") as f:
-            try:
-                config = json.load(f)
-                for user_data in config.values():
-                    if isinstance(user_data, dict) and "unlocked" in user_data:
-                        unlocked.update(
-                            [item["wife_name"] for item in user_data["unlocked"]]
-                        )
-            except json.JSONDecodeError:
-                print(f"解析配置文件 {config_file} 时出错")
 
-    return unlocked
+def get_thumbnails(img_dir: str, thumbnail_size: tuple = (80, 80)) -> ThumbnailStore:
+    """获取图片目录对应的缩略图仓库"""
+    cache_dir = os.path.join(
+        os.path.dirname(os.path.abspath(img_dir)), THUMBNAIL_DIR_NAME
+    )
+    return get_thumbnail_store(cache_dir, thumbnail_size)
 
 
-def create_full_color_gallery(
-    img_dir: str, output_path: str, thumbnail_size: tuple = (80, 80)
+def draw_tile(
+    collage: Image.Image,
+    draw: ImageDraw.ImageDraw,
+    img_path: str,
+    x: int,
+    y: int,
+    thumbnail_size: tuple = (80, 80),
+    thumbnails: Optional[ThumbnailStore] = None,
 ) -> None:
-    """创建全彩色的老婆图鉴（通用版）"""
-    all_wives = get_all_wife_images(img_dir)
-    if not all_wives:
-        raise ValueError(f"本地图片目录 {img_dir} 中未找到任何图片文件")
+    """在拼贴图的 (x, y) 处绘制一张带边框的彩色图块，优先使用缩略图仓库"""
+    try:
+        if thumbnails is not None:
+            thumb = thumbnails.get(img_path, render_thumbnail)
+        else:
+            thumb = render_thumbnail(img_path, thumbnail_size)
+        # 保持彩色
+        collage.paste(thumb, (x, y))
+    except:
+        # 出错时绘制默认彩色方块
+        draw.rectangle(
+            [(x, y), (x + thumbnail_size[0], y + thumbnail_size[1])],
+            fill=(220, 220, 220),
+        )
 
-    # 创建拼贴图
-    images_per_row = 10
-    total = len(all_wives)
-    rows = (total + images_per_row - 1) // images_per_row
-    cols = min(total, images_per_row)
+    # 绘制边框
+    draw.rectangle(
+        [(x, y), (x + thumbnail_size[0] - 1, y + thumbnail_size[1] - 1)],
+        outline=(200, 200, 200),
+        width=1,
+    )
 
-    collage_width = cols * thumbnail_size[0]
-    collage_height = rows * thumbnail_size[1]
-    collage = Image.new("RGB", (collage_width, collage_height), (245, 245, 245))
-    draw = ImageDraw.Draw(collage)
 
-    # 处理所有图片为彩色
-    for i, wife in enumerate(all_wives):
-        row = i // images_per_row
-        col = i % images_per_row
-        x = col * thumbnail_size[0]
-        y = row * thumbnail_size[1]
+def atlas_file(png_path: str) -> str:
+    """通用大图在当前存储格式下的实际文件路径"""
+    if ATLAS_FORMAT == "raw":
+        return os.path.splitext(png_path)[0] + RAW_ATLAS_EXT
+    return png_path
 
-        img_path = os.path.join(img_dir, wife)
-        try:
-            with Image.open(img_path) as img:
-                # 处理透明背景
-                if img.mode in ("RGBA", "LA"):
-                    background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])
-                    img = background
-                elif img.mode == "P":
-                    img = img.convert("RGB")
-
-                # 缩放图片
-                img.thumbnail(thumbnail_size)
-
-                # 创建固定尺寸的缩略图
-                thumb = Image.new("RGB", thumbnail_size, (255, 255, 255))
-                offset = (
-                    (thumbnail_size[0] - img.width) // 2,
-                    (thumbnail_size[1] - img.height) // 2,
-                )
-                thumb.paste(img, offset)
-
-                # 保持彩色
-                collage.paste(thumb, (x, y))
-        except:
-            # 出错时绘制默认彩色方块
-            draw.rectangle(
-                [(x, y), (x + thumbnail_size[0], y + thumbnail_size[1])],
-                fill=(220, 220, 220),
-            )
 
-        # 绘制边框
-        draw.rectangle(
-            [(x, y), (x + thumbnail_size[0] - 1, y + thumbnail_size[1] - 1)],
-            outline=(200, 200, 200),
-            width=1,
-        )
+def atlas_exists(png_path: str) -> bool:
+    path = atlas_file(png_path)
+    if ATLAS_FORMAT == "raw":
+        # 旧版本按 RGB 保存的原始大图视为不存在，由调用方重建
+        return is_raw_atlas(path)
+    return os.path.exists(path)
 
-    # 保存彩色大图
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    collage.save(output_path)
 
+def load_atlas(png_path: str) -> Image.Image:
+    """读取通用大图；原始格式下为内存映射，不解压"""
+    path = atlas_file(png_path)
+    if ATLAS_FORMAT == "raw":
+        return open_raw_atlas(path).image()
+    with Image.open(path) as img:
+        img.load()
+        return img
 
-def update_gallery_with_black_and_white(
-    group_id: str,
+
+def grayscale_atlas(image: Image.Image) -> Image.Image:
+    """
+    由彩色大图生成同布局的黑白大图。
+    按 RGB 保存，与彩色大图读取后的模式一致，合成群图鉴时两者无需再转换。
+    """
+    return ImageOps.grayscale(image).convert("RGB")
+
+
+def save_atlas(image: Image.Image, png_path: str) -> None:
+    """按当前存储格式保存通用大图"""
+    path = atlas_file(png_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if ATLAS_FORMAT == "raw":
+        forget_raw_atlas(path)
+        save_raw_atlas(image, path)
+    else:
+        image.save(path)
+
+
+def load_atlas_rows(png_path: str, top: int, bottom: int) -> Image.Image:
+    """只读取通用大图中 [top, bottom) 的像素行"""
+    if ATLAS_FORMAT == "raw":
+        return open_raw_atlas(atlas_file(png_path)).rows(top, bottom)
+    gallery = load_atlas(png_path)
+    return gallery.crop((0, top, gallery.width, min(bottom, gallery.height)))
+
+
+def page_count(total: int, page_size: Optional[int]) -> int:
+    """图鉴总页数，page_size 为空时不分页"""
+    if not page_size or total <= 0:
+        return 1
+    return (total + page_size - 1) // page_size
+
+
+def page_slice(total: int, page: int, page_size: Optional[int]) -> Tuple[int, int]:
+    """第 page 页（从 1 开始）包含的下标范围 [start, end)"""
+    if not page_size:
+        return 0, total
+    start = min(max(page - 1, 0) * page_size, total)
+    return start, min(start + page_size, total)
+
+
+def load_gallery_manifest(
+    color_gallery_dir: str, thumbnail_size: tuple = (80, 80)
+) -> GalleryManifest:
+    """读取通用彩色大图的清单"""
+    return GalleryManifest.load(
+        os.path.join(color_gallery_dir, MANIFEST_NAME), thumbnail_size
+    )
+
+
+def create_full_color_gallery(
     img_dir: str,
-    config_dir: str,
-    color_gallery_path: str,
     output_path: str,
     thumbnail_size: tuple = (80, 80),
-) -> None:
-    """在通用彩色大图上渲染未解锁的黑白图片"""
-    all_wives = sorted(get_all_wife_images(img_dir))  # 确保顺序固定
-    if not all_wives:
+    catalog_fingerprint: Optional[str] = None,
+) -> GalleryManifest:
+    """
+    创建或增量更新全彩色的老婆图鉴（通用版），并同步生成同布局的黑白大图：
+    每个老婆的位置记录在清单中，新图片追加到新位置，
+    修改过的图片只重绘对应图块，有图片被删除时才整体重建。
+    catalog_fingerprint 为调用方图片索引的摘要，与本进程索引不一致时先重新扫描目录。
+    """
+    catalog = get_wife_catalog(img_dir).checked_snapshot(catalog_fingerprint)
+    if not catalog.names:
         raise ValueError(f"本地图片目录 {img_dir} 中未找到任何图片文件")
+    color_gallery_dir = os.path.dirname(output_path)
+    if (
+        _atlas_checked_versions.get(output_path) == catalog.version
+        and atlas_exists(output_path)
+        and atlas_exists(os.path.join(color_gallery_dir, COMMON_BW_GALLERY_NAME))
+    ):
+        return load_gallery_manifest(color_gallery_dir, thumbnail_size)
+
+    os.makedirs(color_gallery_dir, exist_ok=True)
+    with FileLock(os.path.join(color_gallery_dir, COMMON_GALLERY_LOCK_NAME)):
+        return _update_full_color_gallery(img_dir, output_path, thumbnail_size, catalog)
+
+
+def _update_full_color_gallery(
+    img_dir: str,
+    output_path: str,
+    thumbnail_size: tuple,
+    catalog: CatalogSnapshot,
+) -> GalleryManifest:
+    # 在文件锁内执行：重新读取清单，其他进程可能刚更新过大图
+    all_wives = list(catalog.names)
+    manifest = load_gallery_manifest(os.path.dirname(output_path), thumbnail_size)
+    bw_output_path = os.path.join(os.path.dirname(output_path), COMMON_BW_GALLERY_NAME)
+    has_atlas = atlas_exists(output_path)
+    if has_atlas and not atlas_exists(bw_output_path):
+        # 旧版本只生成过彩色大图，补生成黑白大图
+        save_atlas(grayscale_atlas(load_atlas(output_path)), bw_output_path)
+    if has_atlas and _atlas_checked_versions.get(output_path) == catalog.version:
+        return manifest
+
+    fingerprints = {}
+    for wife in all_wives:
+        try:
+            fingerprints[wife] = image_fingerprint(os.path.join(img_dir, wife))
+        except OSError:
+            fingerprints[wife] = None
+
+    if not has_atlas:
+        # 大图丢失时清单已失效
+        manifest.slots, manifest.index, manifest.fingerprints = [], {}, {}
+    old_count = len(manifest)
+    rebuild, added, changed = manifest.sync(all_wives, fingerprints)
+    _atlas_checked_versions[output_path] = catalog.version
+    if not added and not changed:
+        return manifest
+
+    collage = Image.new("RGB", manifest.canvas_size(), (245, 245, 245))
+    if has_atlas and not rebuild:
+        # 保留已有图块，只绘制新增和修改的部分
+        old_width, old_height = manifest.canvas_size(old_count)
+        old_collage = load_atlas(output_path)
+        collage.paste(old_collage.crop((0, 0, old_width, old_height)), (0, 0))
+    draw = ImageDraw.Draw(collage)
+
+    thumbnails = get_thumbnails(img_dir, thumbnail_size)
+    for wife in added + changed:
+        x, y = manifest.position(manifest.index[wife])
+        draw_tile(
+            collage,
+            draw,
+            os.path.join(img_dir, wife),
+            x,
+            y,
+            thumbnail_size,
+            thumbnails,
+        )
+    thumbnails.save()
+
+    # 保存彩色大图、对应的黑白大图与清单
+    save_atlas(collage, output_path)
+    save_atlas(grayscale_atlas(collage), bw_output_path)
+    manifest.version += 1
+    manifest.save()
+    return manifest
+
 
-    unlocked_wives = get_unlocked_wives(group_id, config_dir)
+def warm_common_gallery(
+    img_dir: str, color_gallery_dir: str, thumbnail_size: tuple = (80, 80)
+) -> None:
+    """插件启动时预先生成通用大图，本地没有图片时跳过"""
+    try:
+        create_full_color_gallery(
+            img_dir,
+            os.path.join(color_gallery_dir, COMMON_COLOR_GALLERY_NAME),
+            thumbnail_size,
+        )
+    except ValueError:
+        pass
+
+
+def draw_gallery_title(
+    collage: Image.Image,
+    group_id: str,
+    unlocked_count: int,
+    total_count: int,
+    page: int = 1,
+    pages: int = 1,
+) -> None:
+    """重绘群图鉴顶部的标题栏"""
+    draw = ImageDraw.Draw(collage)
+    draw.rectangle([(0, 0), (collage.width, TITLE_HEIGHT - 1)], fill=(245, 245, 245))
+    title = f"群{group_id}老婆图鉴 - 已解锁: {unlocked_count}/{total_count}"
+    if pages > 1:
+        title += f" ({page}/{pages})"
+    draw.text((10, 5), title, fill=(0, 0, 0))
+
+
+def _page_bounds(
+    manifest: GalleryManifest, page: int, page_size: Optional[int]
+) -> Tuple[int, int, int, int]:
+    """群图鉴某一页的图块范围 [start, end) 与在大图中的像素行范围 [top, bottom)"""
+    start, end = page_slice(len(manifest), page, page_size)
+    top = manifest.position(start)[1]
+    bottom = manifest.position(max(end - 1, start))[1] + manifest.thumbnail_size[1]
+    return start, end, top, bottom
+
+
+def _normalize_page_size(
+    manifest: GalleryManifest, page_size: Optional[int]
+) -> Optional[int]:
+    # 每页须为整行，才能直接按行切取大图
+    if not page_size:
+        return None
+    per_row = manifest.images_per_row
+    return max(per_row, page_size // per_row * per_row)
+
+
+def unlocked_fingerprint(unlocked_wives: Set[str]) -> str:
+    """已解锁集合的哈希，集合不变则哈希不变"""
+    digest = hashlib.sha1()
+    for wife in sorted(unlocked_wives):
+        digest.update(wife.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def gallery_extension() -> str:
+    """当前编码配置对应的图鉴文件扩展名"""
+    return _ENCODER_EXTENSIONS[GALLERY_ENCODER["format"].upper()]
+
+
+def encoder_is_lossless() -> bool:
+    """当前编码是否无损，有损编码时不在旧图鉴上修补，避免反复压缩失真"""
+    fmt = GALLERY_ENCODER["format"].upper()
+    return fmt == "PNG" or (fmt == "WEBP" and GALLERY_ENCODER.get("lossless", False))
+
+
+def _encoder_options(encoder: dict) -> dict:
+    fmt = encoder["format"].upper()
+    optimize = encoder.get("optimize", False)
+    if fmt == "PNG":
+        return {
+            "compress_level": encoder.get("compress_level", 6),
+            "optimize": optimize,
+        }
+    if fmt == "JPEG":
+        return {
+            "quality": encoder.get("quality", 85),
+            "optimize": optimize,
+            "progressive": encoder.get("progressive", False),
+        }
+    return {
+        "quality": encoder.get("quality", 85),
+        "lossless": encoder.get("lossless", False),
+        # WEBP 的 method 越大压缩越好、越慢
+        "method": 6 if optimize else 4,
+    }
+
+
+def encoder_signature() -> str:
+    """编码配置的摘要，配置变化后已有图鉴不再复用"""
+    return json.dumps(GALLERY_ENCODER, sort_keys=True)
+
+
+def encode_gallery_image(image: Image.Image, encoder: Optional[dict] = None) -> bytes:
+    """按编码配置（默认 GALLERY_ENCODER）把图鉴编码为字节"""
+    encoder = encoder or GALLERY_ENCODER
+    buffer = io.BytesIO()
+    image.save(buffer, format=encoder["format"].upper(), **_encoder_options(encoder))
+    return buffer.getvalue()
+
+
+def save_gallery_image(image: Image.Image, output_path: str) -> None:
+    """按编码配置保存图鉴（先编码到内存，再原子替换）"""
+    payload = encode_gallery_image(image)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    atomic_write_bytes(output_path, payload)
 
-    # 打开通用彩色大图
-    with Image.open(color_gallery_path) as gallery:
-        draw = ImageDraw.Draw(gallery)
 
-        # 在彩色图上渲染未解锁的黑白图片
-        for i, wife in enumerate(all_wives):
-            if wife not in unlocked_wives:
-                # 计算在大图中的行列位置
-                row = i // 10  # 每行10个图片
-                col = i % 10
+def _gallery_state_path(output_path: str) -> str:
+    # 记录图鉴生成时的输入（大图版本、解锁集合等），用于判断能否复用
+    return os.path.splitext(output_path)[0] + ".json"
 
-                # 计算在画布上的像素坐标
-                x = col * thumbnail_size[0]
-                y = row * thumbnail_size[1]
 
-                # 提取对应位置的彩色图块
-                block = gallery.crop(
-                    (x, y, x + thumbnail_size[0], y + thumbnail_size[1])
-                )
+def _load_gallery_state(output_path: str) -> Optional[dict]:
+    state_path = _gallery_state_path(output_path)
+    if not os.path.exists(output_path) or not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取图鉴状态失败: {e}")
+        return None
 
-                # 将图块转换为灰度图
-                block = ImageOps.grayscale(block)
 
-                # 将灰度图块替换回大图
-                gallery.paste(block, (x, y))
+def _save_gallery_state(
+    output_path: str,
+    manifest: GalleryManifest,
+    unlocked_wives: Set[str],
+    page_size: Optional[int] = None,
+) -> None:
+    state = {
+        "atlas_version": manifest.version,
+        "encoder": encoder_signature(),
+        "page_size": page_size,
+        "unlocked_hash": unlocked_fingerprint(unlocked_wives),
+        "unlocked": sorted(unlocked_wives),
+    }
+    atomic_write_bytes(_gallery_state_path(output_path), encode_json(state))
 
-        # 添加标题（包含群ID）
-        title = f"群{group_id}老婆图鉴 - 已解锁: {len(unlocked_wives)}/{len(all_wives)}"
-        title_font_size = 16
-        title_height = title_font_size + 10
 
-        # 创建一个更高的新画布，包含标题区域
-        new_collage = Image.new(
-            "RGB", (gallery.width, gallery.height + title_height), (245, 245, 245)
+def patch_wife_gallery(
+    group_id: str,
+    color_gallery_path: str,
+    output_path: str,
+    manifest: GalleryManifest,
+    unlocked_wives: Set[str],
+    newly_unlocked: Set[str],
+    page: int = 1,
+    page_size: Optional[int] = None,
+) -> None:
+    """在已有群图鉴（某一页）上把新解锁的图块换回彩色，并更新标题"""
+    tile_w, tile_h = manifest.thumbnail_size
+    start, end, top, _ = _page_bounds(manifest, page, page_size)
+    color_gallery = None
+    with Image.open(output_path) as gallery:
+        gallery.load()
+        for wife in newly_unlocked:
+            slot = manifest.index.get(wife)
+            if slot is None or not start <= slot < end:
+                # 不在本地图包或不在本页的老婆没有图块
+                continue
+            if color_gallery is None:
+                color_gallery = load_atlas(color_gallery_path)
+            x, y = manifest.position(slot)
+            tile = color_gallery.crop((x, y, x + tile_w, y + tile_h))
+            gallery.paste(tile, (x, y - top + TITLE_HEIGHT))
+        draw_gallery_title(
+            gallery,
+            group_id,
+            len(unlocked_wives),
+            len(manifest),
+            page,
+            page_count(len(manifest), page_size),
         )
-        new_draw = ImageDraw.Draw(new_collage)
+        save_gallery_image(gallery, output_path)
 
-        # 粘贴原拼贴图到新画布
-        new_collage.paste(gallery, (0, title_height))
 
-        # 绘制标题
-        new_draw.text((10, 5), title, fill=(0, 0, 0))
+def update_gallery_with_black_and_white(
+    group_id: str,
+    img_dir: str,
+    config_dir: str,
+    color_gallery_path: str,
+    output_path: str,
+    thumbnail_size: tuple = (80, 80),
+    unlocked_wives: Optional[Set[str]] = None,
+    page: int = 1,
+    page_size: Optional[int] = None,
+) -> None:
+    """
+    用通用彩色大图和黑白大图合成群图鉴（的第 page 页）：
+    按解锁情况生成蒙版，一次 composite 完成，已解锁取彩色，未解锁取黑白。
+    分页时只读取本页所在的像素行。
+    """
+    color_gallery_dir = os.path.dirname(color_gallery_path)
+    manifest = load_gallery_manifest(color_gallery_dir, thumbnail_size)
+    if not manifest.slots:
+        raise ValueError(f"通用彩色大图 {color_gallery_path} 缺少图鉴清单")
+
+    if unlocked_wives is None:
+        unlocked_wives = get_unlocked_wives(group_id, config_dir)
+
+    page_size = _normalize_page_size(manifest, page_size)
+    start, end, top, bottom = _page_bounds(manifest, page, page_size)
+    bw_gallery_path = os.path.join(color_gallery_dir, COMMON_BW_GALLERY_NAME)
+    gallery = load_atlas_rows(color_gallery_path, top, bottom)
+    bw_gallery = load_atlas_rows(bw_gallery_path, top, bottom)
+
+    # 已解锁图块在蒙版中为白色
+    mask = Image.new("L", gallery.size, 0)
+    mask_draw = ImageDraw.Draw(mask)
+    tile_w, tile_h = manifest.thumbnail_size
+    for wife in unlocked_wives:
+        slot = manifest.index.get(wife)
+        if slot is not None and start <= slot < end:
+            x, y = manifest.position(slot)
+            y -= top
+            mask_draw.rectangle([(x, y), (x + tile_w - 1, y + tile_h - 1)], fill=255)
+
+    if bw_gallery.mode != gallery.mode:
+        # 旧版本生成的单通道黑白大图
+        bw_gallery = bw_gallery.convert(gallery.mode)
+    # 原始格式下两张大图都是映射文件的 RGBX 视图，合成前不拷贝
+    composed = Image.composite(gallery, bw_gallery, mask)
+
+    # 创建一个更高的新画布，包含标题区域
+    new_collage = Image.new(
+        "RGB", (composed.width, composed.height + TITLE_HEIGHT), (245, 245, 245)
+    )
+
+    # 粘贴合成后的大图到新画布
+    new_collage.paste(composed, (0, TITLE_HEIGHT))
+
+    # 绘制标题（包含群ID）
+    draw_gallery_title(
+        new_collage,
+        group_id,
+        len(unlocked_wives),
+        len(manifest),
+        page,
+        page_count(len(manifest), page_size),
+    )
 
-        # 保存最终图鉴
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        new_collage.save(output_path)
+    # 保存最终图鉴
+    save_gallery_image(new_collage, output_path)
 
 
 # 清理旧图鉴文件
 def cleanup_old_galleries(
     gallery_dir: str, max_age_days: int = MAX_GALLERY_AGE
 ) -> None:
-    """清理超过指定天数的图鉴文件"""
+    """清理超过指定天数的图鉴文件及其状态文件"""
     if not os.path.exists(gallery_dir):
         return
 
@@ -182,17 +564,31 @@ def cleanup_old_galleries(
 
     for filename in os.listdir(gallery_dir):
         file_path = os.path.join(gallery_dir, filename)
-        # 只处理图片文件
-        if filename.lower().endswith((".png", ".jpg", ".jpeg")):
-            try:
-                # 获取文件修改时间
-                mtime = os.path.getmtime(file_path)
-                # 如果文件修改时间超过最大保留时间，则删除
-                if current_time - mtime > max_age_seconds:
-                    os.remove(file_path)
-                    print(f"删除过期图鉴文件: {filename}")
-            except Exception as e:
-                print(f"清理文件时出错: {filename}, 错误: {e}")
+        lower = filename.lower()
+        # 处理图片文件，以及图片已不存在时遗留的图鉴状态文件
+        is_image = lower.endswith((".png", ".jpg", ".jpeg", ".webp"))
+        is_state = lower.endswith(".json") and lower.startswith(
+            ("gallery_", "personal_gallery_")
+        )
+        if not is_image and not is_state:
+            continue
+        try:
+            # 获取文件修改时间
+            mtime = os.path.getmtime(file_path)
+            # 如果文件修改时间超过最大保留时间，则删除
+            if current_time - mtime > max_age_seconds:
+                os.remove(file_path)
+                print(f"删除过期图鉴文件: {filename}")
+                if is_image:
+                    # 状态文件随图片一起删除
+                    state_path = _gallery_state_path(file_path)
+                    if os.path.exists(state_path):
+                        os.remove(state_path)
+        except FileNotFoundError:
+            # 状态文件可能已随图片删除
+            pass
+        except Exception as e:
+            print(f"清理文件时出错: {filename}, 错误: {e}")
 
 
 def create_or_update_wife_gallery(
@@ -202,12 +598,17 @@ def create_or_update_wife_gallery(
     color_gallery_dir: str,
     output_path: str,
     thumbnail_size: tuple = (80, 80),
+    unlocked_wives: Optional[Set[str]] = None,
+    page: int = 1,
+    page_size: Optional[int] = None,
+    catalog_fingerprint: Optional[str] = None,
 ) -> str:
     """
-    检查并生成老婆图鉴：
-    1. 使用通用彩色大图（所有群共用）
-    2. 在通用彩色大图上渲染未解锁的黑白图片
-    3. 清理旧的图鉴文件
+    检查并生成老婆图鉴（分页时只生成第 page 页，每页一个输出文件）：
+    1. 使用通用彩色大图（所有群共用），图片有增改时增量更新
+    2. 大图版本与群解锁集合都未变化时直接复用上次的图鉴
+    3. 只新增了解锁时在原图鉴上替换对应图块，否则用彩色与黑白大图重新合成
+    4. 清理旧的图鉴文件
     """
     # 先清理旧的图鉴文件
     gallery_dir = os.path.dirname(output_path)
@@ -215,16 +616,44 @@ def create_or_update_wife_gallery(
 
     # 通用彩色大图路径
     common_color_gallery_path = os.path.join(
-        color_gallery_dir, "common_color_gallery.png"
+        color_gallery_dir, COMMON_COLOR_GALLERY_NAME
     )
 
-    # 检查通用彩色大图是否存在，不存在则生成
-    if not os.path.exists(common_color_gallery_path):
-        create_full_color_gallery(
-            img_dir=img_dir,
-            output_path=common_color_gallery_path,
-            thumbnail_size=thumbnail_size,
-        )
+    # 生成通用彩色大图，已是最新时不做任何绘制
+    manifest = create_full_color_gallery(
+        img_dir=img_dir,
+        output_path=common_color_gallery_path,
+        thumbnail_size=thumbnail_size,
+        catalog_fingerprint=catalog_fingerprint,
+    )
+
+    if unlocked_wives is None:
+        unlocked_wives = get_unlocked_wives(group_id, config_dir)
+    page_size = _normalize_page_size(manifest, page_size)
+
+    state = _load_gallery_state(output_path)
+    if (
+        state
+        and state["atlas_version"] == manifest.version
+        and state.get("encoder") == encoder_signature()
+        and state.get("page_size") == page_size
+    ):
+        if state["unlocked_hash"] == unlocked_fingerprint(unlocked_wives):
+            return output_path
+        previous = set(state["unlocked"])
+        if previous <= unlocked_wives and encoder_is_lossless():
+            patch_wife_gallery(
+                group_id,
+                common_color_gallery_path,
+                output_path,
+                manifest,
+                unlocked_wives,
+                unlocked_wives - previous,
+                page,
+                page_size,
+            )
+            _save_gallery_state(output_path, manifest, unlocked_wives, page_size)
+            return output_path
 
     # 在通用彩色大图上渲染未解锁的黑白图片
     update_gallery_with_black_and_white(
@@ -234,21 +663,58 @@ def create_or_update_wife_gallery(
         color_gallery_path=common_color_gallery_path,
         output_path=output_path,
         thumbnail_size=thumbnail_size,
+        unlocked_wives=unlocked_wives,
+        page=page,
+        page_size=page_size,
     )
+    _save_gallery_state(output_path, manifest, unlocked_wives, page_size)
 
     return output_path
 
 
+def ordered_fingerprint(wives: List[str]) -> str:
+    """有序列表的哈希，顺序或内容变化都会改变哈希"""
+    digest = hashlib.sha1()
+    for wife in wives:
+        digest.update(wife.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
 def create_personal_wife_gallery(
     unlocked_wives: List[str],
     img_dir: str,
     output_path: str,
     thumbnail_size: tuple = (80, 80),
+    page: int = 1,
+    page_size: Optional[int] = None,
 ) -> str:
-    """创建个人老婆图鉴"""
+    """
+    创建个人老婆图鉴（分页时只生成第 page 页）：
+    解锁列表未变化时直接复用已有图片；列表只在末尾追加时，只绘制新增的图块。
+    """
+    start, end = page_slice(len(unlocked_wives), page, page_size)
+    unlocked_wives = unlocked_wives[start:end]
     if not unlocked_wives:
         raise ValueError("未找到已解锁的老婆图片")
 
+    fingerprint = ordered_fingerprint(unlocked_wives)
+    state = _load_gallery_state(output_path)
+    old_count = 0
+    if (
+        state
+        and state.get("encoder") == encoder_signature()
+        and state.get("count", 0) <= len(unlocked_wives)
+    ):
+        if state["fingerprint"] == fingerprint:
+            return output_path
+        if (
+            encoder_is_lossless()
+            and ordered_fingerprint(unlocked_wives[: state["count"]])
+            == state["fingerprint"]
+        ):
+            old_count = state["count"]
+
     # 创建拼贴图
     images_per_row = 10
     total = len(unlocked_wives)
@@ -258,54 +724,32 @@ def create_personal_wife_gallery(
     collage_width = cols * thumbnail_size[0]
     collage_height = rows * thumbnail_size[1]
     collage = Image.new("RGB", (collage_width, collage_height), (245, 245, 245))
+    if old_count:
+        # 保留已有图块
+        with Image.open(output_path) as old_collage:
+            collage.paste(old_collage, (0, 0))
     draw = ImageDraw.Draw(collage)
 
-    for i, wife in enumerate(unlocked_wives):
+    thumbnails = get_thumbnails(img_dir, thumbnail_size)
+    for i in range(old_count, total):
         row = i // images_per_row
         col = i % images_per_row
         x = col * thumbnail_size[0]
         y = row * thumbnail_size[1]
-
-        img_path = os.path.join(img_dir, wife)
-        try:
-            with Image.open(img_path) as img:
-                # 处理透明背景
-                if img.mode in ("RGBA", "LA"):
-                    background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])
-                    img = background
-                elif img.mode == "P":
-                    img = img.convert("RGB")
-
-                # 缩放图片
-                img.thumbnail(thumbnail_size)
-
-                # 创建固定尺寸的缩略图
-                thumb = Image.new("RGB", thumbnail_size, (255, 255, 255))
-                offset = (
-                    (thumbnail_size[0] - img.width) // 2,
-                    (thumbnail_size[1] - img.height) // 2,
-                )
-                thumb.paste(img, offset)
-
-                # 保持彩色
-                collage.paste(thumb, (x, y))
-        except:
-            # 出错时绘制默认彩色方块
-            draw.rectangle(
-                [(x, y), (x + thumbnail_size[0], y + thumbnail_size[1])],
-                fill=(220, 220, 220),
-            )
-
-        # 绘制边框
-        draw.rectangle(
-            [(x, y), (x + thumbnail_size[0] - 1, y + thumbnail_size[1] - 1)],
-            outline=(200, 200, 200),
-            width=1,
+        draw_tile(
+            collage,
+            draw,
+            os.path.join(img_dir, unlocked_wives[i]),
+            x,
+            y,
+            thumbnail_size,
+            thumbnails,
         )
+    thumbnails.save()
 
     # 保存个人图鉴
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    collage.save(output_path)
+    save_gallery_image(collage, output_path)
+    state = {"fingerprint": fingerprint, "count": total, "encoder": encoder_signature()}
+    atomic_write_bytes(_gallery_state_path(output_path), encode_json(state))
 
     return output_path
@@ -0,0 +1,44 @@
+from typing import Any, Dict, Optional, Tuple
+
+# 指令后允许直接跟参数（如“牛老婆小明”），否则指令后须为结尾或空白
+MODE_PREFIX = "prefix"
+MODE_WORD = "word"
+
+# 前缀树节点中存放指令的键（不会与单个字符冲突）
+_END = ""
+
+
+class CommandRouter:
+    """
+    前缀树指令表：
+    一次遍历消息开头的字符即可找到最长匹配的指令，
+    首字符不在表中的普通聊天消息只需一次字典查找即可跳过。
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def add(self, word: str, target: Any, mode: str = MODE_WORD) -> None:
+        """注册触发词，同一触发词重复注册时以后者为准"""
+        if not word:
+            raise ValueError("指令不能为空")
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = (target, mode)
+
+    def match(self, message: str) -> Optional[Tuple[Any, str]]:
+        """匹配消息开头的指令，返回 (目标, 去除首尾空白的参数)，不是指令时返回 None"""
+        message = message.lstrip()
+        node = self._root
+        found = None
+        for i, char in enumerate(message):
+            node = node.get(char)
+            if node is None:
+                break
+            entry = node.get(_END)
+            if entry is not None:
+                rest = message[i + 1 :]
+                if entry[1] == MODE_PREFIX or not rest or rest[0].isspace():
+                    found = (entry[0], rest.strip())
+        return found
@@ -0,0 +1,63 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Tuple
+
+# 内存中缓存的图片字节总量上限（字节）
+FILE_BYTES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _read_file(path: str) -> Tuple[os.stat_result, bytes]:
+    with open(path, "rb") as f:
+        return os.fstat(f.fileno()), f.read()
+
+
+class FileBytesCache:
+    """
+    发送路径上的异步文件读取：
+    1. stat 与读取都在线程池中执行，不阻塞事件循环
+    2. 最近读取的文件内容按 LRU 保留在内存中，总量不超过 max_bytes
+    3. 以 (路径, 修改时间, 大小) 判断缓存是否有效，文件被替换后自动重新读取
+    """
+
+    def __init__(self, max_bytes: int = FILE_BYTES_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # 路径 -> (修改时间(纳秒), 大小, 内容)
+        self._entries: "OrderedDict[str, Tuple[int, int, bytes]]" = OrderedDict()
+        self._total = 0
+
+    def _drop(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total -= len(entry[2])
+
+    def _put(self, path: str, stat: os.stat_result, data: bytes) -> None:
+        self._drop(path)
+        if len(data) > self.max_bytes:
+            return
+        self._entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+        self._total += len(data)
+        while self._total > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._total -= len(entry[2])
+
+    async def read(self, path: str) -> bytes:
+        """读取文件内容，文件未变化时直接返回内存中的副本"""
+        loop = asyncio.get_running_loop()
+        entry = self._entries.get(path)
+        if entry is not None:
+            try:
+                stat = await loop.run_in_executor(None, os.stat, path)
+            except OSError:
+                self._drop(path)
+                raise
+            if (stat.st_mtime_ns, stat.st_size) == entry[:2]:
+                self._entries.move_to_end(path)
+                return entry[2]
+        stat, data = await loop.run_in_executor(None, _read_file, path)
+        self._put(path, stat, data)
+        return data
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._total = 0
@@ -0,0 +1,114 @@
+import json
+import os
+from typing import Dict, List, Tuple
+
+from .persistence import atomic_write_bytes, encode_json
+
+# 图鉴清单文件名（与通用彩色大图放在同一目录）
+MANIFEST_NAME = "gallery_manifest.json"
+# 每行图片数量
+IMAGES_PER_ROW = 10
+
+
+def image_fingerprint(img_path: str) -> List[int]:
+    """图片指纹：修改时间（纳秒）与文件大小"""
+    stat = os.stat(img_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class GalleryManifest:
+    """
+    通用彩色大图的清单：
+    1. 记录每个老婆固定的图块位置（slots 中的下标）
+    2. 记录生成图块时源图片的指纹，用于发现新增与修改
+    3. version 在大图每次更新后递增，供各群图鉴判断是否需要重建
+    """
+
+    def __init__(
+        self,
+        path: str,
+        thumbnail_size: Tuple[int, int],
+        images_per_row: int = IMAGES_PER_ROW,
+    ):
+        self.path = path
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.images_per_row = images_per_row
+        self.version = 0
+        self.slots: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.fingerprints: Dict[str, List[int]] = {}
+
+    @classmethod
+    def load(cls, path: str, thumbnail_size: Tuple[int, int]) -> "GalleryManifest":
+        """读取清单，不存在或布局参数不一致时返回空清单"""
+        manifest = cls(path, thumbnail_size)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (
+                tuple(data["thumbnail_size"]) != manifest.thumbnail_size
+                or data["images_per_row"] != manifest.images_per_row
+            ):
+                # 布局变化，旧的位置已无意义，但保留版本号使其继续递增
+                manifest.version = data.get("version", 0)
+                return manifest
+            manifest.version = data["version"]
+            manifest.slots = data["slots"]
+            manifest.index = {name: i for i, name in enumerate(manifest.slots)}
+            manifest.fingerprints = data["fingerprints"]
+        except Exception as e:
+            print(f"读取图鉴清单失败: {e}")
+        return manifest
+
+    def save(self) -> None:
+        data = {
+            "version": self.version,
+            "thumbnail_size": list(self.thumbnail_size),
+            "images_per_row": self.images_per_row,
+            "slots": self.slots,
+            "fingerprints": self.fingerprints,
+        }
+        atomic_write_bytes(self.path, encode_json(data))
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def position(self, slot: int) -> Tuple[int, int]:
+        """图块在大图中的左上角坐标"""
+        row, col = divmod(slot, self.images_per_row)
+        return col * self.thumbnail_size[0], row * self.thumbnail_size[1]
+
+    def canvas_size(self, count: int = None) -> Tuple[int, int]:
+        """容纳 count 个图块（默认全部）所需的画布尺寸"""
+        count = len(self.slots) if count is None else count
+        rows = (count + self.images_per_row - 1) // self.images_per_row
+        cols = min(count, self.images_per_row)
+        return cols * self.thumbnail_size[0], rows * self.thumbnail_size[1]
+
+    def sync(
+        self, names: List[str], fingerprints: Dict[str, List[int]]
+    ) -> Tuple[bool, List[str], List[str]]:
+        """
+        按当前图片列表更新清单，返回 (是否需要整体重建, 新增的图片, 修改过的图片)。
+        新图片追加到新位置；有图片被删除时重新分配全部位置。
+        """
+        current = set(names)
+        if any(name not in current for name in self.slots):
+            self.slots = list(names)
+            self.index = {name: i for i, name in enumerate(self.slots)}
+            self.fingerprints = dict(fingerprints)
+            return True, list(names), []
+
+        added = [name for name in names if name not in self.index]
+        changed = [
+            name
+            for name in self.slots
+            if self.fingerprints.get(name) != fingerprints.get(name)
+        ]
+        for name in added:
+            self.index[name] = len(self.slots)
+            self.slots.append(name)
+        self.fingerprints = dict(fingerprints)
+        return False, added, changed
@@ -0,0 +1,479 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from .persistence import MODE_WRITE_THROUGH, WriteBehindWriter
+from .serializers import load_file
+
+# 常驻内存的最大群数量，超出后淘汰最久未使用的群
+MAX_RESIDENT_GROUPS = 256
+# 群锁的条带数量，多个群共用一把锁以限制锁对象数量
+LOCK_STRIPES = 64
+
+
+# 上海时区相对 UTC 的偏移（秒）
+SHANGHAI_UTC_OFFSET = 8 * 3600
+_DAY_SECONDS = 24 * 3600
+
+# (当日日期, 下一个零点的时间戳)，过了零点才重新计算
+_today_cache = ("", 0.0)
+
+
+def next_midnight(now: Optional[float] = None) -> float:
+    """上海时区下一个零点的时间戳"""
+    if now is None:
+        now = time.time()
+    return now + _DAY_SECONDS - (now + SHANGHAI_UTC_OFFSET) % _DAY_SECONDS
+
+
+def get_today():
+    """获取上海时区当日日期（缓存到下一个零点）"""
+    global _today_cache
+    now = time.time()
+    today, expires = _today_cache
+    if now >= expires:
+        today = time.strftime("%Y-%m-%d", time.gmtime(now + SHANGHAI_UTC_OFFSET))
+        _today_cache = (today, next_midnight(now))
+    return today
+
+
+def upgrade_unlocked_format(unlocked_list):
+    """将旧格式的 unlocked 列表转换为包含解锁时间的对象数组"""
+    today = get_today()
+    return [{"wife_name": wife, "unlock_date": today} for wife in unlocked_list]
+
+
+def upgrade_group_config(config: dict) -> dict:
+    """兼容旧格式的群配置数据，原地升级并返回"""
+    for user_id in list(config.keys()):
+        user_data = config[user_id]
+        if isinstance(user_data, list):
+            # 旧格式：列表格式
+            if len(user_data) >= 2:
+                old_wife = user_data[0]
+                old_date = user_data[1]
+                old_nick = user_data[2] if len(user_data) > 2 else "用户"
+                config[user_id] = {
+                    "current": {"wife_name": old_wife, "date": old_date},
+                    "unlocked": [{"wife_name": old_wife, "unlock_date": old_date}],
+                    "nickname": old_nick,
+                }
+        else:
+            # 检查 unlocked 格式是否需要升级
+            if "unlocked" in user_data and isinstance(user_data["unlocked"], list):
+                if user_data["unlocked"] and isinstance(user_data["unlocked"][0], str):
+                    # 升级旧格式的 unlocked 列表
+                    user_data["unlocked"] = upgrade_unlocked_format(
+                        user_data["unlocked"]
+                    )
+    return config
+
+
+def upgrade_ntr_limit_format(data):
+    """
+    将旧格式的NTR次数数据升级为新的日期关联格式。
+    此函数具有幂等性，可以安全地处理已经是新格式的数据。
+    旧格式: {'group_id': {'user_id': count_int}}
+    新格式: {'group_id': {'user_id': {'date_str': count_int}}}
+    """
+    if not data:
+        return data
+
+    # 通过检查第一个用户记录的格式来判断是否需要转换
+    try:
+        first_group_data = next(iter(data.values()))
+        # 处理群组存在但无用户记录的边缘情况
+        if not first_group_data:
+            return data
+        first_user_record = next(iter(first_group_data.values()))
+        # 如果记录值是字典，说明已经是新格式，无需转换
+        if isinstance(first_user_record, dict):
+            return data
+    except (StopIteration, AttributeError):
+        # 数据为空或结构不完整（例如，群里没人），无需转换
+        return data
+
+    # 确定是旧格式，执行转换
+    new_data = {}
+    today = get_today()
+    for group_id, user_data in data.items():
+        if not isinstance(user_data, dict):
+            continue
+        new_group_data = {}
+        # 只处理值为整数的旧格式记录
+        for user_id, count in user_data.items():
+            if isinstance(count, int):
+                new_group_data[user_id] = {today: count}
+        new_data[group_id] = new_group_data
+    return new_data
+
+
+def new_user_data(nickname: str) -> dict:
+    """新用户的初始记录"""
+    return {
+        "current": {"wife_name": None, "date": ""},
+        "unlocked": [],
+        "nickname": nickname,
+    }
+
+
+class UnlockIndex:
+    """
+    群内解锁记录的内存索引，不落盘（磁盘上仍是 unlocked 列表）：
+    1. 每个用户一份 老婆名 -> 解锁日期 的字典，O(1) 判断是否已解锁
+    2. 全群已解锁老婆的并集，解锁只增不减，随 record_unlock 增量维护
+    用户记录被替换或 unlocked 列表被外部修改时，该用户的字典按需重建。
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        # 用户ID -> (用户记录, 已索引的 unlocked 条目数, 老婆名 -> 解锁日期)
+        self.users: Dict[str, Tuple[dict, int, Dict[str, str]]] = {}
+        self.union: Set[str] = set()
+        for user_id in list(config.keys()):
+            self.user_dates(user_id)
+
+    def user_dates(self, user_id: str) -> Dict[str, str]:
+        """用户的 老婆名 -> 解锁日期"""
+        user_data = self.config.get(user_id)
+        if not isinstance(user_data, dict):
+            return {}
+        unlocked = user_data.get("unlocked") or []
+        entry = self.users.get(user_id)
+        if entry is None or entry[0] is not user_data or entry[1] != len(unlocked):
+            dates = {}
+            for item in unlocked:
+                dates.setdefault(item["wife_name"], item.get("unlock_date"))
+            entry = self.users[user_id] = (user_data, len(unlocked), dates)
+            self.union.update(dates)
+        return entry[2]
+
+    def add(self, user_id: str, wife_name: str, unlock_date: str) -> None:
+        """记录已追加到 unlocked 列表末尾的一条解锁"""
+        user_data, count, dates = self.users[user_id]
+        dates[wife_name] = unlock_date
+        self.users[user_id] = (user_data, count + 1, dates)
+        self.union.add(wife_name)
+
+    def sync_users(self) -> None:
+        """补充索引建立后新加入群配置的用户"""
+        if len(self.users) != len(self.config):
+            for user_id in list(self.config.keys()):
+                if user_id not in self.users:
+                    self.user_dates(user_id)
+
+
+class JsonGroupBackend:
+    """
+    默认存储：每个群一个 JSON 文件，修改后整群交给写入器落盘。
+    行级操作（upsert_user 等）在这里不需要单独写入，由 save 统一处理。
+    """
+
+    def __init__(self, config_dir: str, writer: WriteBehindWriter):
+        self.config_dir = config_dir
+        self.writer = writer
+
+    def _path(self, group_id: str) -> str:
+        return os.path.join(self.config_dir, f"{group_id}.json")
+
+    def _key(self, group_id: str) -> str:
+        return f"group:{group_id}"
+
+    def read(self, group_id: str) -> dict:
+        try:
+            return upgrade_group_config(load_file(self._path(group_id)))
+        except Exception as e:
+            print(f"加载群配置失败: {e}")
+            return {}
+
+    def save(self, group_id: str, config: dict) -> None:
+        self.writer.mark_dirty(
+            self._key(group_id), self._path(group_id), lambda: config
+        )
+
+    def is_dirty(self, group_id: str) -> bool:
+        return self.writer.is_dirty(self._key(group_id))
+
+    def upsert_user(self, group_id: str, user_id: str, nickname: str) -> None:
+        pass
+
+    def set_current(
+        self, group_id: str, user_id: str, wife_name: Optional[str], date: str
+    ) -> None:
+        pass
+
+    def add_unlock(
+        self, group_id: str, user_id: str, seq: int, wife_name: str, unlock_date: str
+    ) -> None:
+        pass
+
+    def log_ntr(
+        self,
+        group_id: str,
+        config: dict,
+        user_id: str,
+        target_id: str,
+        success: bool,
+        date: str,
+    ) -> None:
+        pass
+
+    def pending_groups(self) -> List[str]:
+        return []
+
+    def compact(self, group_id: str, config: dict) -> None:
+        pass
+
+
+class GroupLocks:
+    """
+    按群分配的异步锁（锁条带）：
+    群号哈希到固定数量的锁上，群再多锁的数量也不变。
+    同一条带上的不同群会互相等待，但不会产生错误。
+    """
+
+    def __init__(self, stripes: int = LOCK_STRIPES):
+        # 延迟创建，确保锁在事件循环内生成
+        self._locks = [None] * stripes
+
+    def get(self, group_id: str) -> asyncio.Lock:
+        index = hash(str(group_id)) % len(self._locks)
+        lock = self._locks[index]
+        if lock is None:
+            lock = self._locks[index] = asyncio.Lock()
+        return lock
+
+
+class PinnedGroupLock:
+    """
+    群锁的上下文管理器：持有锁期间群配置固定在缓存中不被淘汰，
+    锁内 await 之后按群号取到的仍是同一份配置。
+    """
+
+    def __init__(self, store: "GroupStore", group_id: str):
+        self.store = store
+        self.group_id = str(group_id)
+        self._lock = store.locks.get(group_id)
+
+    async def __aenter__(self):
+        await self._lock.acquire()
+        self.store.pin(self.group_id)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.store.unpin(self.group_id)
+        self._lock.release()
+
+
+class GroupStore:
+    """
+    群配置的进程级缓存：
+    1. 每个群只从磁盘读取并升级一次，之后常驻内存
+    2. 超过 max_groups 时按 LRU 淘汰最久未使用的群
+    3. 返回的配置字典即缓存本体，修改后调用 save 交给存储后端落盘
+       （SQLite 后端由 ensure_user / set_current / record_unlock 逐行写入）
+    4. 尚未写入的群与持有群锁的群不会被淘汰
+    5. 读-改-写操作须持有 lock(group_id)，避免并发修改互相覆盖
+    """
+
+    def __init__(
+        self,
+        config_dir: str,
+        max_groups: int = MAX_RESIDENT_GROUPS,
+        writer: Optional[WriteBehindWriter] = None,
+        backend=None,
+    ):
+        self.config_dir = config_dir
+        self.max_groups = max_groups
+        self.writer = writer or WriteBehindWriter(mode=MODE_WRITE_THROUGH)
+        self.backend = backend or JsonGroupBackend(config_dir, self.writer)
+        self.locks = GroupLocks()
+        # 群号 -> 解锁版本号，每次有新解锁时递增（仅存在于内存）
+        self._unlock_versions: Dict[str, int] = {}
+        self._groups: "OrderedDict[str, dict]" = OrderedDict()
+        # 群号 -> 解锁索引，群配置被替换或淘汰时重建
+        self._indexes: Dict[str, UnlockIndex] = {}
+        # 群号 -> 持有群锁的数量，固定的群不被淘汰
+        self._pins: Dict[str, int] = {}
+        # 图鉴生成在线程池中读取缓存，结构变更需加锁
+        self._lock = threading.RLock()
+
+    def lock(self, group_id: str) -> PinnedGroupLock:
+        """获取群的修改锁（async with 使用，持有期间群不会被淘汰）"""
+        return PinnedGroupLock(self, group_id)
+
+    def pin(self, group_id: str) -> None:
+        with self._lock:
+            self._pins[group_id] = self._pins.get(group_id, 0) + 1
+
+    def unpin(self, group_id: str) -> None:
+        with self._lock:
+            count = self._pins.get(group_id, 0) - 1
+            if count > 0:
+                self._pins[group_id] = count
+            else:
+                self._pins.pop(group_id, None)
+
+    def _put(self, group_id: str, config: dict) -> None:
+        self._groups[group_id] = config
+        self._groups.move_to_end(group_id)
+        while len(self._groups) > self.max_groups:
+            for oldest in self._groups:
+                if oldest not in self._pins and not self.backend.is_dirty(oldest):
+                    break
+            else:
+                # 全部待写入或被固定，稍后再淘汰
+                break
+            del self._groups[oldest]
+            self._indexes.pop(oldest, None)
+
+    def load(self, group_id: str) -> dict:
+        """获取群配置，未命中时从磁盘加载"""
+        group_id = str(group_id)
+        with self._lock:
+            config = self._groups.get(group_id)
+            if config is not None:
+                self._groups.move_to_end(group_id)
+                return config
+        # 磁盘读取不持锁，避免阻塞其他群
+        config = self.backend.read(group_id)
+        with self._lock:
+            # 并发加载时以先放入缓存的为准
+            if group_id in self._groups:
+                self._groups.move_to_end(group_id)
+                return self._groups[group_id]
+            self._put(group_id, config)
+            return config
+
+    def save(self, group_id: str, config: dict) -> None:
+        """更新缓存并标记待写入"""
+        group_id = str(group_id)
+        with self._lock:
+            self._put(group_id, config)
+        self.backend.save(group_id, config)
+
+    def evict(self, group_id: str) -> None:
+        """从缓存中移除指定群"""
+        with self._lock:
+            self._groups.pop(str(group_id), None)
+            self._indexes.pop(str(group_id), None)
+
+    def _index(self, group_id: str, config: dict) -> UnlockIndex:
+        # 调用方先 load（磁盘读取不持锁），再持有 self._lock 调用
+        index = self._indexes.get(group_id)
+        if index is None or index.config is not config:
+            index = self._indexes[group_id] = UnlockIndex(config)
+        return index
+
+    def ensure_user(self, group_id: str, user_id: str, nickname: str) -> dict:
+        """获取用户记录，不存在时创建"""
+        config = self.load(group_id)
+        user_id = str(user_id)
+        if user_id not in config:
+            config[user_id] = new_user_data(nickname)
+            self.backend.upsert_user(str(group_id), user_id, nickname)
+        return config[user_id]
+
+    def set_current(
+        self, group_id: str, user_id: str, wife_name: Optional[str], date: str
+    ) -> None:
+        """设置用户的当日老婆（wife_name 为 None 表示清除），用户须已存在"""
+        config = self.load(group_id)
+        config[str(user_id)]["current"] = {"wife_name": wife_name, "date": date}
+        self.backend.set_current(str(group_id), str(user_id), wife_name, date)
+
+    def record_unlock(
+        self, group_id: str, user_id: str, wife_name: str, unlock_date: str
+    ) -> bool:
+        """记录用户解锁（去重），有新解锁时递增群的解锁版本号"""
+        if not wife_name:
+            return False
+        group_id, user_id = str(group_id), str(user_id)
+        config = self.load(group_id)
+        with self._lock:
+            index = self._index(group_id, config)
+            if wife_name in index.user_dates(user_id):
+                return False
+            unlocked = index.config[user_id]["unlocked"]
+            unlocked.append({"wife_name": wife_name, "unlock_date": unlock_date})
+            index.add(user_id, wife_name, unlock_date)
+        self.backend.add_unlock(
+            group_id, user_id, len(unlocked) - 1, wife_name, unlock_date
+        )
+        self._unlock_versions[group_id] = self._unlock_versions.get(group_id, 0) + 1
+        return True
+
+    def get_unlock_date(
+        self, group_id: str, user_id: str, wife_name: str
+    ) -> Optional[str]:
+        """用户解锁指定老婆的日期，未解锁时返回 None"""
+        config = self.load(group_id)
+        with self._lock:
+            index = self._index(str(group_id), config)
+            return index.user_dates(str(user_id)).get(wife_name)
+
+    def log_ntr(
+        self, group_id: str, user_id: str, target_id: str, success: bool, date: str
+    ) -> None:
+        """记录一次牛老婆尝试（仅日志后端保存，供统计使用）"""
+        group_id = str(group_id)
+        config = self.load(group_id)
+        self.backend.log_ntr(
+            group_id, config, str(user_id), str(target_id), success, date
+        )
+
+    def compact(self) -> None:
+        """把存储后端中尚未合并的数据整理落盘（插件关闭时调用）"""
+        for group_id in self.backend.pending_groups():
+            try:
+                self.backend.compact(group_id, self.load(group_id))
+            except Exception as e:
+                print(f"整理群数据失败: {group_id}, 错误: {e}")
+
+    def expire_current(self, today: str) -> int:
+        """清除常驻群中非 today 的当日老婆（仅内存，磁盘上的过期记录按日期判断即可），返回清除数量"""
+        expired = 0
+        with self._lock:
+            for config in self._groups.values():
+                for user_data in config.values():
+                    current = (
+                        user_data.get("current")
+                        if isinstance(user_data, dict)
+                        else None
+                    )
+                    if current and current.get("date") not in ("", today):
+                        user_data["current"] = {"wife_name": None, "date": ""}
+                        expired += 1
+        return expired
+
+    def unlock_version(self, group_id: str) -> int:
+        """群的解锁版本号，版本号不变说明群内解锁集合未变"""
+        return self._unlock_versions.get(str(group_id), 0)
+
+    def get_unlocked_wives(self, group_id: str) -> Set[str]:
+        """获取指定群组中所有已解锁的老婆图片名"""
+        config = self.load(group_id)
+        with self._lock:
+            index = self._index(str(group_id), config)
+            index.sync_users()
+            return set(index.union)
+
+
+_stores: Dict[str, GroupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_group_store(config_dir: str, **kwargs) -> GroupStore:
+    """
+    获取配置目录对应的共享 GroupStore，同一目录全进程只有一个实例。
+    kwargs 仅在首次创建时生效。
+    """
+    key = os.path.abspath(config_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = GroupStore(config_dir, **kwargs)
+        return store
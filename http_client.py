@@ -0,0 +1,98 @@
+import asyncio
+import random
+from typing import Dict, Mapping, Optional
+
+import aiohttp
+
+# 单次请求超时（秒）
+DEFAULT_TIMEOUT = 10.0
+# 连接池大小与空闲连接保持时间（秒）
+MAX_CONNECTIONS = 16
+KEEPALIVE_TIMEOUT = 30.0
+# 同时进行的请求上限
+MAX_CONCURRENCY = 8
+# 失败重试次数与退避基数（秒）
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+
+class HttpResponse:
+    """已读取完毕的响应"""
+
+    def __init__(self, status: int, headers: Mapping[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class AsyncHttpClient:
+    """
+    共享的异步 HTTP 客户端：
+    1. 复用连接池与 keep-alive，避免每次请求重新握手
+    2. 每个请求有超时，并用信号量限制并发数
+    3. 网络错误和 5xx 响应按指数退避重试
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_concurrency: int = MAX_CONCURRENCY,
+        retries: int = MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 会话须在事件循环内创建
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def request(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> HttpResponse:
+        """
+        发送 GET 请求并读取完整响应。
+        非 5xx 的响应直接返回，由调用方判断状态码；重试耗尽后抛出最后一次的异常。
+        """
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with session.get(url, headers=headers) as resp:
+                        body = await resp.read()
+                        if resp.status < 500 or attempt >= self.retries:
+                            # 复制为大小写不敏感的响应头
+                            return HttpResponse(resp.status, resp.headers.copy(), body)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    raise
+            # 指数退避并加入随机抖动，避免多个请求同时重试
+            delay = self.backoff * (2**attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            attempt += 1
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
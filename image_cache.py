@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .http_client import AsyncHttpClient
+from .persistence import atomic_write_bytes
+
+# 远程图片磁盘缓存的总大小上限（字节）
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 常见图片格式的文件头，用于校验下载内容
+_IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",  # JPEG
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"GIF87a",
+    b"GIF89a",
+    b"BM",  # BMP
+    b"RIFF",  # WebP
+)
+
+
+def is_image_data(head: bytes) -> bool:
+    """根据文件头判断是否为图片"""
+    return head.startswith(_IMAGE_SIGNATURES)
+
+
+class ImageDiskCache:
+    """
+    远程老婆图片的本地磁盘缓存：
+    1. 以图片文件名为键，总大小超过 max_bytes 时按 LRU 淘汰
+    2. 下载内容校验长度与图片文件头，原子写入，启动时剔除损坏文件
+    3. 同一张图片的并发请求只触发一次下载
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        base_url: str,
+        http: AsyncHttpClient,
+        max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.http = http
+        self.max_bytes = max_bytes
+        # 文件名 -> 文件大小，按最近使用排序
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._load_future = None
+
+    def _filename(self, wife_name: str) -> str:
+        # 非普通文件名（含路径分隔符等）时改用哈希，防止写出缓存目录
+        if os.path.basename(wife_name) == wife_name and not wife_name.startswith("."):
+            return wife_name
+        ext = os.path.splitext(wife_name)[1]
+        return hashlib.sha1(wife_name.encode("utf-8")).hexdigest() + ext
+
+    def _path(self, wife_name: str) -> str:
+        return os.path.join(self.cache_dir, self._filename(wife_name))
+
+    def _scan(self) -> None:
+        """扫描已有缓存，按访问时间恢复 LRU 顺序，并删除损坏的文件"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    valid = is_image_data(f.read(16))
+                stat = entry.stat()
+                if not valid or stat.st_size == 0:
+                    os.remove(entry.path)
+                    continue
+                found.append((stat.st_atime, entry.name, stat.st_size))
+            except OSError as e:
+                print(f"检查图片缓存失败: {entry.name}, 错误: {e}")
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+        self._evict()
+
+    async def load(self) -> None:
+        """加载已有缓存索引（只执行一次）"""
+        if self._load_future is None:
+            self._load_future = asyncio.get_running_loop().run_in_executor(
+                None, self._scan
+            )
+        await self._load_future
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self._total > self.max_bytes and self._entries:
+            name = next(iter(self._entries))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            self._total -= self._entries.pop(name)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _touch(self, filename: str, path: str) -> bool:
+        """命中时校验文件仍然完整，并刷新访问时间"""
+        try:
+            if os.path.getsize(path) != self._entries[filename]:
+                raise OSError("文件大小不一致")
+            os.utime(path)
+        except OSError:
+            self._total -= self._entries.pop(filename, 0)
+            return False
+        self._entries.move_to_end(filename)
+        return True
+
+    async def get_path(self, wife_name: str) -> Optional[str]:
+        """返回缓存图片的本地路径，未缓存时下载；图床返回非 200 时返回 None"""
+        await self.load()
+        filename = self._filename(wife_name)
+        path = self._path(wife_name)
+        if filename in self._entries and self._touch(filename, path):
+            return path
+
+        task = self._inflight.get(filename)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                self._download(wife_name, filename, path)
+            )
+            self._inflight[filename] = task
+            task.add_done_callback(lambda _: self._inflight.pop(filename, None))
+        # shield：某个等待者被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    async def _download(self, wife_name: str, filename: str, path: str):
+        response = await self.http.request(self.base_url + wife_name)
+        if response.status != 200:
+            return None
+        body = response.body
+        expected = response.headers.get("Content-Length")
+        # 压缩传输时 Content-Length 为压缩后长度，不作比较
+        if (
+            expected is not None
+            and expected.isdigit()
+            and "Content-Encoding" not in response.headers
+            and int(expected) != len(body)
+        ):
+            raise ValueError(f"图片下载不完整: {wife_name}")
+        if not is_image_data(body[:16]):
+            raise ValueError(f"下载内容不是图片: {wife_name}")
+
+        await asyncio.get_running_loop().run_in_executor(
+            None, atomic_write_bytes, path, body
+        )
+        self._total -= self._entries.pop(filename, 0)
+        self._entries[filename] = len(body)
+        self._total += len(body)
+        self._evict(keep=filename)
+        return path
@@ -0,0 +1,268 @@
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+from .group_store import JsonGroupBackend, new_user_data, upgrade_group_config
+from .persistence import WriteBehindWriter, atomic_write_bytes
+from .serializers import MODE_COMPACT, dumps, load_file, loads
+
+# 日志超过该大小（字节）后在后台合并进快照
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+
+def record_ntr_stats(config: dict, user_id: str, target_id: str, success: bool) -> None:
+    """累计用户记录中的牛老婆统计（发起次数、成功次数、被牛走次数）"""
+    user_data = config.get(user_id)
+    if isinstance(user_data, dict):
+        stats = user_data.setdefault("ntr_stats", {})
+        stats["attempts"] = stats.get("attempts", 0) + 1
+        if success:
+            stats["successes"] = stats.get("successes", 0) + 1
+    target_data = config.get(target_id)
+    if success and isinstance(target_data, dict):
+        stats = target_data.setdefault("ntr_stats", {})
+        stats["lost"] = stats.get("lost", 0) + 1
+
+
+def _current_stats(config: dict, user_id: str) -> Optional[dict]:
+    user_data = config.get(user_id)
+    if isinstance(user_data, dict) and "ntr_stats" in user_data:
+        return dict(user_data["ntr_stats"])
+    return None
+
+
+def _restore_stats(config: dict, user_id: str, stats: Optional[dict]) -> None:
+    user_data = config.get(user_id)
+    if stats is not None and isinstance(user_data, dict):
+        user_data["ntr_stats"] = dict(stats)
+
+
+def apply_event(config: dict, event: dict, seen: Dict[str, Set[str]]) -> None:
+    """
+    把一条日志记录应用到群配置上（与 GroupStore 的对应操作一致）。
+    seen 为 用户ID -> 已解锁老婆名，重放时用于解锁去重；
+    ntr 记录带有双方更新后的统计值，重放时直接覆盖。
+    已合并进快照的记录再次重放，结果不变。
+    """
+    op = event.get("op")
+    user_id = event.get("u")
+    if op == "user":
+        if user_id not in config:
+            config[user_id] = new_user_data(event.get("n"))
+        return
+    if op == "ntr":
+        _restore_stats(config, user_id, event.get("us"))
+        _restore_stats(config, event.get("t"), event.get("ts"))
+        return
+    user_data = config.get(user_id)
+    if not isinstance(user_data, dict):
+        return
+    if op == "current":
+        user_data["current"] = {"wife_name": event.get("w"), "date": event.get("d")}
+    elif op == "unlock":
+        wives = seen.get(user_id)
+        if wives is None:
+            wives = seen[user_id] = {
+                item["wife_name"] for item in user_data.get("unlocked") or []
+            }
+        if event.get("w") not in wives:
+            wives.add(event.get("w"))
+            user_data.setdefault("unlocked", []).append(
+                {"wife_name": event.get("w"), "unlock_date": event.get("d")}
+            )
+
+
+class JournalGroupBackend(JsonGroupBackend):
+    """
+    日志存储：快照 + 追加日志。
+    1. 快照即原有的 {群号}.json，格式不变
+    2. 每次抽老婆、解锁、牛老婆只向 {群号}.log 追加一行紧凑 JSON，不再整群重写
+       （牛老婆的统计保存在用户记录的 ntr_stats 中，只有日志存储记录）
+    3. 加载时读取快照并依次重放 .log.compacting 与 .log，遇到损坏的行即停止
+    4. 日志超过 compact_bytes 后，由 save 触发合并：日志改名为 .log.compacting，
+       新快照在线程池中写入，完成后删除 .log.compacting；中途崩溃时重放仍能得到完整状态
+    提供与 JsonGroupBackend 相同的接口，可直接传给 GroupStore。
+    """
+
+    def __init__(
+        self,
+        config_dir: str,
+        writer: WriteBehindWriter,
+        compact_bytes: int = JOURNAL_COMPACT_BYTES,
+    ):
+        super().__init__(config_dir, writer)
+        self.compact_bytes = compact_bytes
+        # 群号 -> 当前日志大小
+        self._log_sizes: Dict[str, int] = {}
+        # 群号 -> 合并序号，后台写入快照前据此判断是否已被更新的合并取代
+        self._compact_seq: Dict[str, int] = {}
+        # 日志改名、快照写入与加载互斥
+        self._lock = threading.RLock()
+
+    def _log_path(self, group_id: str) -> str:
+        return os.path.join(self.config_dir, f"{group_id}.log")
+
+    def _compacting_path(self, group_id: str) -> str:
+        return self._log_path(group_id) + ".compacting"
+
+    def _append(self, group_id: str, event: dict) -> None:
+        line = dumps(event, MODE_COMPACT) + b"\n"
+        try:
+            with open(self._log_path(group_id), "ab") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"写入群日志失败: {group_id}, 错误: {e}")
+            return
+        self._log_sizes[group_id] = self._log_sizes.get(group_id, 0) + len(line)
+
+    def _replay(self, path: str, config: dict, seen: Dict[str, Set[str]]) -> int:
+        """重放日志文件，返回完好部分的字节数"""
+        with open(path, "rb") as f:
+            data = f.read()
+        good = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                # 写入中途崩溃留下的半行
+                break
+            try:
+                event = loads(line)
+            except Exception:
+                print(f"群日志损坏，忽略之后的记录: {path}")
+                break
+            if isinstance(event, dict):
+                apply_event(config, event, seen)
+            good += len(line)
+        return good
+
+    def read(self, group_id: str) -> dict:
+        with self._lock:
+            config = {}
+            if os.path.exists(self._path(group_id)):
+                try:
+                    config = upgrade_group_config(load_file(self._path(group_id)))
+                except Exception as e:
+                    print(f"加载群配置失败: {e}")
+                    config = {}
+            seen: Dict[str, Set[str]] = {}
+            size = 0
+            for path in (self._compacting_path(group_id), self._log_path(group_id)):
+                if not os.path.exists(path):
+                    continue
+                try:
+                    good = self._replay(path, config, seen)
+                    if good != os.path.getsize(path):
+                        # 截掉损坏的尾部，后续追加的记录才能被读到
+                        os.truncate(path, good)
+                except OSError as e:
+                    print(f"读取群日志失败: {path}, 错误: {e}")
+                    continue
+                # 上次未完成合并留下的记录也计入，关闭时一并合并
+                size += good
+            self._log_sizes[group_id] = size
+            return config
+
+    def save(self, group_id: str, config: dict) -> None:
+        # 修改已追加到日志，这里只在日志过大时触发合并
+        if self._log_sizes.get(group_id, 0) < self.compact_bytes:
+            return
+        payload, seq = self._begin_compact(group_id, config)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._finish_compact(group_id, payload, seq)
+            return
+        future = loop.run_in_executor(
+            None, self._finish_compact, group_id, payload, seq
+        )
+        future.add_done_callback(self._report_error)
+
+    @staticmethod
+    def _report_error(future) -> None:
+        if future.exception() is not None:
+            print(f"合并群日志失败: {future.exception()}")
+
+    def _begin_compact(self, group_id: str, config: dict):
+        """编码快照并把当前日志移入 .log.compacting，须在修改群配置的线程调用"""
+        payload = self.writer.encode(config)
+        log_path = self._log_path(group_id)
+        compacting_path = self._compacting_path(group_id)
+        with self._lock:
+            if os.path.exists(log_path):
+                if os.path.exists(compacting_path):
+                    # 上一次合并尚未完成，把日志接在其后
+                    with open(log_path, "rb") as src, open(
+                        compacting_path, "ab"
+                    ) as dst:
+                        dst.write(src.read())
+                    os.remove(log_path)
+                else:
+                    os.replace(log_path, compacting_path)
+            self._log_sizes[group_id] = 0
+            seq = self._compact_seq[group_id] = self._compact_seq.get(group_id, 0) + 1
+        return payload, seq
+
+    def _finish_compact(self, group_id: str, payload: bytes, seq: int) -> None:
+        with self._lock:
+            if self._compact_seq.get(group_id) != seq:
+                # 已有更新的合并，由它写入快照
+                return
+            atomic_write_bytes(self._path(group_id), payload, self.writer.fsync)
+            try:
+                os.remove(self._compacting_path(group_id))
+            except FileNotFoundError:
+                pass
+
+    def is_dirty(self, group_id: str) -> bool:
+        # 日志追加即落盘
+        return False
+
+    def pending_groups(self) -> List[str]:
+        return [group_id for group_id, size in self._log_sizes.items() if size]
+
+    def compact(self, group_id: str, config: dict) -> None:
+        """立即把日志合并进快照（同步执行）"""
+        payload, seq = self._begin_compact(group_id, config)
+        self._finish_compact(group_id, payload, seq)
+
+    def upsert_user(self, group_id: str, user_id: str, nickname: str) -> None:
+        self._append(group_id, {"op": "user", "u": user_id, "n": nickname})
+
+    def set_current(
+        self, group_id: str, user_id: str, wife_name: Optional[str], date: str
+    ) -> None:
+        self._append(
+            group_id, {"op": "current", "u": user_id, "w": wife_name, "d": date}
+        )
+
+    def add_unlock(
+        self, group_id: str, user_id: str, seq: int, wife_name: str, unlock_date: str
+    ) -> None:
+        # 顺序即日志顺序，不需要记录 seq
+        self._append(
+            group_id, {"op": "unlock", "u": user_id, "w": wife_name, "d": unlock_date}
+        )
+
+    def log_ntr(
+        self,
+        group_id: str,
+        config: dict,
+        user_id: str,
+        target_id: str,
+        success: bool,
+        date: str,
+    ) -> None:
+        record_ntr_stats(config, user_id, target_id, success)
+        # 记录更新后的统计值而不是增量，重复重放不会多算
+        self._append(
+            group_id,
+            {
+                "op": "ntr",
+                "u": user_id,
+                "t": target_id,
+                "ok": success,
+                "d": date,
+                "us": _current_stats(config, user_id),
+                "ts": _current_stats(config, target_id) if success else None,
+            },
+        )
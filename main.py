@@ -1,36 +1,91 @@
 import asyncio
+import atexit
+import importlib
 import json
 import os
 import random
 import re
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timedelta
+import time
 
-import requests
 from astrbot.api.all import *
 from astrbot.api.event import filter
 
+from .command_router import MODE_PREFIX, MODE_WORD, CommandRouter
+from .file_reader import FileBytesCache
+from .group_store import get_group_store, get_today, upgrade_ntr_limit_format
+from .http_client import AsyncHttpClient
+from .image_cache import ImageDiskCache
+from .journal import JournalGroupBackend
+from .persistence import WriteBehindWriter
+from .remote_catalog import RemoteCatalog
+from .render_service import RenderBusy, RenderService
+from .rollover import DailyScheduler
+from .serializers import MODE_PRETTY, get_encoder, load_file
+from .sqlite_backend import SqliteBackend
+from .wife_catalog import get_wife_catalog, parse_wife_name
+
 # 设置插件主目录
 PLUGIN_DIR = os.path.join("data", "plugins", "astrbot_plugin_AnimeWife")
-os.makedirs(PLUGIN_DIR, exist_ok=True)
 
 # 配置文件目录
 CONFIG_DIR = os.path.join(PLUGIN_DIR, "config")
-os.makedirs(CONFIG_DIR, exist_ok=True)
+
+# 落盘模式："write_behind" 延迟合并写入，"write_through" 每次修改立即写入
+PERSIST_MODE = "write_behind"
+# 延迟写入的刷新间隔（秒）
+PERSIST_FLUSH_INTERVAL = 5.0
+# 待写入的文件数达到该值时立即刷新
+PERSIST_MAX_DIRTY = 64
+# 写入后是否 fsync（更可靠，但更慢）
+PERSIST_FSYNC = False
+# 群配置与NTR文件的序列化模式："pretty" 缩进 JSON，"compact" 紧凑 JSON（优先 orjson），
+# "msgpack" 二进制（需安装 msgpack）；读取时自动识别，切换模式不影响已有文件
+PERSIST_SERIALIZER = MODE_PRETTY
+
+# 群配置与NTR数据共用的写入器，进程退出时兜底写入
+writer = WriteBehindWriter(
+    mode=PERSIST_MODE,
+    interval=PERSIST_FLUSH_INTERVAL,
+    max_dirty=PERSIST_MAX_DIRTY,
+    fsync=PERSIST_FSYNC,
+    encode=get_encoder(PERSIST_SERIALIZER),
+)
+atexit.register(writer.flush_sync)
+
+# 存储后端："json" 每个群一个 JSON 文件，
+# "sqlite" 使用单个 WAL 模式数据库，逐行写入（首次启用时自动导入已有 JSON 数据），
+# "journal" 在 JSON 快照之外为每个群追加事件日志，日志过大时合并进快照
+STORAGE_BACKEND = "json"
+SQLITE_DB_FILE = os.path.join(CONFIG_DIR, "anime_wife.db")
+# 群日志合并阈值（字节）
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# SQLite 后端（仅在 STORAGE_BACKEND 为 "sqlite" 时使用）
+sqlite_backend = SqliteBackend(SQLITE_DB_FILE) if STORAGE_BACKEND == "sqlite" else None
+# 日志后端（仅在 STORAGE_BACKEND 为 "journal" 时使用）
+journal_backend = (
+    JournalGroupBackend(CONFIG_DIR, writer, JOURNAL_COMPACT_BYTES)
+    if STORAGE_BACKEND == "journal"
+    else None
+)
+
+# 群配置缓存（与图鉴模块共享）
+group_store = get_group_store(
+    CONFIG_DIR, writer=writer, backend=sqlite_backend or journal_backend
+)
 
 # 本地图片目录
 IMG_DIR = os.path.join(PLUGIN_DIR, "img", "wife")
-os.makedirs(IMG_DIR, exist_ok=True)
+# 本地图片索引（与图鉴模块共享）
+wife_catalog = get_wife_catalog(IMG_DIR)
 
 # 黑白大图目录
 BW_GALLERY_DIR = os.path.join(PLUGIN_DIR, "bw_galleries")
-os.makedirs(BW_GALLERY_DIR, exist_ok=True)
-# 通用黑白大图路径（所有群共用）
-COMMON_BW_GALLERY_PATH = os.path.join(BW_GALLERY_DIR, "common_bw_gallery.png")
 
 # 最终图鉴目录
 GALLERY_DIR = os.path.join(PLUGIN_DIR, "gallery")
-os.makedirs(GALLERY_DIR, exist_ok=True)
+# 图鉴每页最多显示的图片数量（群图鉴按整行取整），0 表示不分页
+GALLERY_PAGE_SIZE = 200
 
 # NTR 状态文件路径
 NTR_STATUS_FILE = os.path.join(CONFIG_DIR, "ntr_status.json")
@@ -39,9 +94,60 @@ NTR_LIMIT_FILE = os.path.join(CONFIG_DIR, "ntr_limit.json")
 
 # 图片的基础 URL
 IMAGE_BASE_URL = "http://save.my996.top/?/img/"
+# 远程图片请求的超时（秒）、并发上限与重试次数
+HTTP_TIMEOUT = 10.0
+HTTP_MAX_CONCURRENCY = 8
+HTTP_RETRIES = 2
+
+# 所有远程图片请求共用的连接池
+http_client = AsyncHttpClient(
+    timeout=HTTP_TIMEOUT,
+    max_concurrency=HTTP_MAX_CONCURRENCY,
+    retries=HTTP_RETRIES,
+)
+
+# 远程图片列表缓存文件及刷新间隔（秒）
+REMOTE_CATALOG_FILE = os.path.join(PLUGIN_DIR, "remote_catalog.json")
+REMOTE_CATALOG_TTL = 3600
+
+# 远程图片列表，本地没有图片时从中抽取
+remote_catalog = RemoteCatalog(
+    IMAGE_BASE_URL, REMOTE_CATALOG_FILE, http_client, ttl=REMOTE_CATALOG_TTL
+)
+
+# 远程图片的本地缓存目录及总大小上限（字节）
+IMAGE_CACHE_DIR = os.path.join(PLUGIN_DIR, "img", "cache")
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
 
-# 创建线程池用于异步处理
-executor = ThreadPoolExecutor(max_workers=2)
+# 远程老婆图片的磁盘缓存
+image_cache = ImageDiskCache(
+    IMAGE_CACHE_DIR, IMAGE_BASE_URL, http_client, max_bytes=IMAGE_CACHE_MAX_BYTES
+)
+
+# 图片发送方式："path" 直接把本地文件路径交给适配器（省去读取与编码），
+# "bytes" 读入内存后发送（适配器与插件不在同一台机器或容器时使用）
+IMAGE_SEND_MODE = "bytes"
+
+# 最近发送过的图片在内存中保留的总大小上限（字节）
+SEND_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 发送图片时的异步读取与内存缓存，热门老婆与刚生成的图鉴无需重复读盘
+send_cache = FileBytesCache(max_bytes=SEND_CACHE_MAX_BYTES)
+
+# 图鉴渲染进程数（None 为 CPU 核数）、排队上限，以及是否使用进程池
+RENDER_WORKERS = None
+RENDER_QUEUE_LIMIT = 16
+RENDER_USE_PROCESSES = True
+
+# 图鉴渲染服务，同一张图鉴的并发请求共用一次渲染
+render_service = RenderService(
+    workers=RENDER_WORKERS,
+    queue_limit=RENDER_QUEUE_LIMIT,
+    use_processes=RENDER_USE_PROCESSES,
+)
+
+# 指令别名：指令 -> 额外的触发词列表，例如 {"抽取老婆": ["抽老婆"]}
+COMMAND_ALIASES = {}
 
 # 每人每天可牛老婆的次数
 _ntr_max = 3
@@ -53,9 +159,14 @@ ntr_statuses = {}  # NTR功能开关状态
 ntr_limits = {}  # NTR次数限制，按群、用户、日期记录
 
 
+def ensure_dirs():
+    """创建插件用到的目录（插件初始化时在线程池中调用）"""
+    for directory in (PLUGIN_DIR, CONFIG_DIR, IMG_DIR, BW_GALLERY_DIR, GALLERY_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+
 def clean_old_ntr_data():
     """清理非当天的NTR计数数据，只保留今日记录"""
-    global ntr_limits
     today = get_today()
     # 遍历所有群和用户，只保留当天的计数
     for group_id in list(ntr_limits.keys()):
@@ -74,17 +185,48 @@ def clean_old_ntr_data():
             del ntr_limits[group_id]
 
 
+def parse_gallery_page(args: str):
+    """解析图鉴指令的页码参数，不是页码时返回 None，未给页码时为第 1 页"""
+    if not args:
+        return 1
+    if not args.isdigit():
+        return None
+    return max(int(args), 1)
+
+
+def gallery_page_size(per_row: int = 1):
+    """每页图片数量（向下取整为 per_row 的倍数），不分页时返回 None"""
+    if GALLERY_PAGE_SIZE <= 0:
+        return None
+    return max(per_row, GALLERY_PAGE_SIZE // per_row * per_row)
+
+
+def gallery_page_count(total: int, page_size) -> int:
+    """图鉴总页数"""
+    if not page_size or total <= 0:
+        return 1
+    return (total + page_size - 1) // page_size
+
+
 def load_ntr_data():
     """加载NTR状态和次数限制数据，并清理历史记录"""
     global ntr_statuses, ntr_limits
     ntr_statuses = {}
     ntr_limits = {}
 
+    if sqlite_backend is not None:
+        try:
+            ntr_statuses, ntr_limits = sqlite_backend.load_ntr()
+            clean_old_ntr_data()
+            sqlite_backend.purge_ntr_counts(get_today())
+        except Exception as e:
+            print(f"加载NTR数据失败: {e}")
+        return
+
     # 加载NTR状态
     if os.path.exists(NTR_STATUS_FILE):
         try:
-            with open(NTR_STATUS_FILE, "r", encoding="utf-8") as f:
-                ntr_statuses = json.load(f)
+            ntr_statuses = load_file(NTR_STATUS_FILE)
         except Exception as e:
             print(f"加载NTR状态失败: {e}")
             ntr_statuses = {}
@@ -92,10 +234,9 @@ def load_ntr_data():
     # 加载NTR次数限制
     if os.path.exists(NTR_LIMIT_FILE):
         try:
-            with open(NTR_LIMIT_FILE, "r", encoding="utf-8") as f:
-                ntr_limits = json.load(f)
-                # 兼容处理：升级旧格式数据
-                ntr_limits = _upgrade_ntr_limit_format(ntr_limits)
+            ntr_limits = load_file(NTR_LIMIT_FILE)
+            # 兼容处理：升级旧格式数据
+            ntr_limits = upgrade_ntr_limit_format(ntr_limits)
         except Exception as e:
             print(f"加载NTR次数限制失败: {e}")
             ntr_limits = {}
@@ -107,88 +248,26 @@ def load_ntr_data():
 
 
 def save_ntr_data():
-    """保存NTR状态和次数限制数据"""
-    try:
-        # 保存NTR状态
-        with open(NTR_STATUS_FILE, "w", encoding="utf-8") as f:
-            json.dump(ntr_statuses, f, ensure_ascii=False, indent=2)
-
-        # 保存NTR次数限制
-        with open(NTR_LIMIT_FILE, "w", encoding="utf-8") as f:
-            json.dump(ntr_limits, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"保存NTR数据失败: {e}")
-
-
-def _upgrade_ntr_limit_format(data):
-    """
-    将旧格式的NTR次数数据升级为新的日期关联格式。
-    此函数具有幂等性，可以安全地处理已经是新格式的数据。
-    旧格式: {'group_id': {'user_id': count_int}}
-    新格式: {'group_id': {'user_id': {'date_str': count_int}}}
-    """
-    if not data:
-        return data
-
-    # 通过检查第一个用户记录的格式来判断是否需要转换
-    try:
-        first_group_data = next(iter(data.values()))
-        # 处理群组存在但无用户记录的边缘情况
-        if not first_group_data:
-            return data
-        first_user_record = next(iter(first_group_data.values()))
-        # 如果记录值是字典，说明已经是新格式，无需转换
-        if isinstance(first_user_record, dict):
-            return data
-    except (StopIteration, AttributeError):
-        # 数据为空或结构不完整（例如，群里没人），无需转换
-        return data
-
-    # 确定是旧格式，执行转换
-    new_data = {}
-    today = get_today()
-    for group_id, user_data in data.items():
-        if not isinstance(user_data, dict):
-            continue
-        new_group_data = {}
-        # 只处理值为整数的旧格式记录
-        for user_id, count in user_data.items():
-            if isinstance(count, int):
-                new_group_data[user_id] = {today: count}
-        new_data[group_id] = new_group_data
-    return new_data
-
-
-def get_today():
-    """获取上海时区当日日期"""
-    utc_now = datetime.utcnow()
-    shanghai_time = utc_now + timedelta(hours=8)
-    return shanghai_time.date().isoformat()
-
-
-def parse_wife_name(wife_name: str) -> (str, str):
-    """
-    解析图片名字，提取角色名和来源
-    支持两种格式：
-    1. 来源.角色名.jpg
-    2. 角色名.jpg/png
-    """
-    parts = wife_name.split(".")
-    if len(parts) >= 3:
-        # 新格式：来源.角色名.jpg
-        source = parts[0]
-        name = parts[1]
+    """标记NTR状态和次数限制数据待写入"""
+    writer.mark_dirty("ntr_status", NTR_STATUS_FILE, lambda: ntr_statuses)
+    writer.mark_dirty("ntr_limit", NTR_LIMIT_FILE, lambda: ntr_limits)
+
+
+def save_ntr_status(group_id: str):
+    """保存一个群的NTR开关"""
+    if sqlite_backend is not None:
+        sqlite_backend.set_ntr_status(group_id, ntr_statuses[group_id])
     else:
-        # 旧格式：角色名.jpg/png 或 角色名.png
-        name = parts[0]
-        source = "未知"
-    return name, source
+        save_ntr_data()
 
 
-def upgrade_unlocked_format(unlocked_list):
-    """将旧格式的 unlocked 列表转换为包含解锁时间的对象数组"""
-    today = get_today()
-    return [{"wife_name": wife, "unlock_date": today} for wife in unlocked_list]
+def save_ntr_count(group_id: str, user_id: str, date: str):
+    """保存一个用户某天的NTR次数"""
+    if sqlite_backend is not None:
+        count = ntr_limits[group_id][user_id][date]
+        sqlite_backend.set_ntr_count(group_id, user_id, date, count)
+    else:
+        save_ntr_data()
 
 
 def get_wife_names_from_unlocked(unlocked):
@@ -198,16 +277,6 @@ def get_wife_names_from_unlocked(unlocked):
     )
 
 
-def get_unlock_date(unlocked, wife_name):
-    """获取指定老婆的解锁时间"""
-    if not isinstance(unlocked, list):
-        return None
-    for item in unlocked:
-        if item["wife_name"] == wife_name:
-            return item.get("unlock_date")
-    return None
-
-
 @register(
     "wife_plugin",
     "长安某",
@@ -218,7 +287,145 @@ def get_unlock_date(unlocked, wife_name):
 class WifePlugin(Star):
     def __init__(self, context: Context):
         super().__init__(context)
-        self.admins = self.load_admins()
+        self.admins = []
+        # (群号, 页码) -> 最近一次生成群图鉴时的 (解锁版本号, 图片目录版本)
+        self.group_gallery_keys = {}
+        # (群号, 用户ID, 页码) -> 最近一次生成个人图鉴时的解锁数量
+        self.personal_gallery_keys = {}
+        self.router = self.build_router()
+        # 初始化完成（目录、NTR数据与管理员已加载）后才处理指令
+        self._ready = asyncio.Event()
+        self._init_task = None
+        self._warmup_task = None
+        # 每日零点换日
+        self._scheduler = DailyScheduler(self._rollover)
+        self._created_at = time.perf_counter()
+        self._first_request_logged = False
+
+    async def initialize(self):
+        """插件加载时调用：在线程池中完成磁盘读取，并在后台预热索引与图鉴"""
+        if self._init_task is None:
+            self._init_task = asyncio.ensure_future(self._initialize())
+        await asyncio.shield(self._init_task)
+
+    async def _initialize(self):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ensure_dirs)
+        if sqlite_backend is not None:
+            migrated = await loop.run_in_executor(
+                None,
+                sqlite_backend.migrate_from_json,
+                CONFIG_DIR,
+                NTR_STATUS_FILE,
+                NTR_LIMIT_FILE,
+            )
+            if migrated:
+                print("已将群配置与NTR数据导入 SQLite 数据库")
+        await loop.run_in_executor(None, load_ntr_data)
+        self.admins = await loop.run_in_executor(None, self.load_admins)
+        self._ready.set()
+        print(f"老婆插件加载完成，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        self._warmup_task = asyncio.ensure_future(self._warmup())
+        self._scheduler.start()
+
+    async def _rollover(self):
+        """每日零点换日：清理前一天的NTR次数与当日老婆，并在后台重新预热"""
+        start = time.perf_counter()
+        today = get_today()
+        # 两步内存清理之间没有 await，对指令处理而言是原子的
+        clean_old_ntr_data()
+        expired = group_store.expire_current(today)
+        if sqlite_backend is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, sqlite_backend.purge_ntr_counts, today
+            )
+        else:
+            save_ntr_data()
+        print(
+            f"老婆插件换日完成（{today}），清除过期老婆 {expired} 个，"
+            f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        if self._warmup_task is None or self._warmup_task.done():
+            self._warmup_task = asyncio.ensure_future(self._warmup())
+
+    async def _warmup(self):
+        """后台预热：图片索引、远程列表与磁盘缓存、图鉴模块与通用大图"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, wife_catalog.refresh)
+            await remote_catalog.load()
+            await image_cache.load()
+            # 图鉴模块依赖 PIL，导入较慢，放到线程池中提前导入
+            collage = await loop.run_in_executor(
+                None, importlib.import_module, ".anime_wife_collage", __package__
+            )
+            await render_service.submit(
+                "warmup",
+                wife_catalog.snapshot().version,
+                collage.warm_common_gallery,
+                IMG_DIR,
+                BW_GALLERY_DIR,
+                (80, 80),
+            )
+            print(
+                f"老婆插件预热完成，耗时 {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"老婆插件预热失败: {e}")
+
+    def build_router(self):
+        """构建指令表：指令 -> (处理函数, 匹配方式)，并加入配置的别名"""
+        commands = {
+            "抽取老婆": (self.animewife, MODE_WORD),
+            "牛老婆": (self.ntr_wife, MODE_PREFIX),
+            "查老婆": (self.search_wife, MODE_PREFIX),
+            "切换ntr状态": (self.switch_ntr, MODE_WORD),
+            "群老婆图鉴": (self.show_group_wife_gallery, MODE_WORD),
+            "老婆图鉴": (self.show_personal_wife_gallery, MODE_WORD),
+        }
+        router = CommandRouter()
+        for word, (handler, mode) in commands.items():
+            router.add(word, handler, mode)
+            for alias in COMMAND_ALIASES.get(word, []):
+                router.add(alias, handler, mode)
+        return router
+
+    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
+    async def dispatch(self, event: AstrMessageEvent):
+        """群消息指令分发，不是指令的消息直接跳过"""
+        route = self.router.match(event.message_str or "")
+        if route is None:
+            return
+        start = time.perf_counter()
+        if not self._ready.is_set():
+            # 旧版本框架不会调用 initialize，由首条指令触发
+            await self.initialize()
+        handler, args = route
+        async for result in handler(event, args):
+            yield result
+        if not self._first_request_logged:
+            self._first_request_logged = True
+            print(
+                f"老婆插件首条指令耗时 {(time.perf_counter() - start) * 1000:.1f}ms，"
+                f"距插件创建 {time.perf_counter() - self._created_at:.1f}s"
+            )
+
+    async def terminate(self):
+        """插件卸载时写入所有未落盘的数据并释放连接池与渲染进程"""
+        self._scheduler.stop()
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+        # 日志存储下把未合并的日志写入快照，切回 JSON 存储时数据也完整
+        group_store.compact()
+        await writer.close()
+        if sqlite_backend is not None:
+            sqlite_backend.close()
+        await http_client.close()
+        render_service.shutdown()
 
     def load_admins(self):
         """加载管理员列表"""
@@ -238,140 +445,87 @@ class WifePlugin(Star):
                 return str(comp.qq)
         return None
 
-    def parse_target(self, event):
-        """解析@目标或用户名，返回用户ID"""
+    def parse_target(self, event, target_name=""):
+        """解析@目标或用户名（指令参数），返回用户ID"""
         target_id = self.parse_at_target(event)
         if target_id:
             return target_id
-        msg = event.message_str.strip()
-        if msg.startswith(("牛老婆", "查老婆")):
-            target_name = msg[len(msg.split()[0]) :].strip()
-            if target_name:
-                group_id = str(event.message_obj.group_id)
-                config = load_group_config(group_id)
-                if config:
-                    for user_id, user_data in config.items():
-                        try:
-                            nick_name = event.get_sender_name() or "未知用户"
-                            if re.search(
-                                re.escape(target_name), nick_name, re.IGNORECASE
-                            ):
-                                return user_id
-                        except:
-                            pass
+        if target_name:
+            group_id = str(event.message_obj.group_id)
+            config = load_group_config(group_id)
+            if config:
+                for user_id, user_data in config.items():
+                    try:
+                        nick_name = event.get_sender_name() or "未知用户"
+                        if re.search(re.escape(target_name), nick_name, re.IGNORECASE):
+                            return user_id
+                    except:
+                        pass
         return None
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def animewife(self, event: AstrMessageEvent):
-        """随机抽取一张二次元老婆"""
-        # 检查消息是否包含指令关键词
-        if "抽取老婆" not in event.message_str.strip():
-            return
-
-        group_id = event.message_obj.group_id
-        if not group_id:
-            return
+    async def build_image(self, path):
+        """按 IMAGE_SEND_MODE 构建本地图片的消息段，不支持按路径发送时退回字节"""
+        if IMAGE_SEND_MODE == "path" and hasattr(Image, "fromFileSystem"):
+            return Image.fromFileSystem(os.path.abspath(path))
+        return Image.fromBytes(await send_cache.read(path))
 
+    async def build_wife_chain(self, text_message, wife_name):
+        """构建文字加老婆图片的消息链，本地没有时从图床缓存获取"""
         try:
-            user_id = str(event.get_sender_id())
-            nickname = event.get_sender_name() or "用户"
+            # 尝试发送图片
+            if wife_name in await wife_catalog.get_snapshot():
+                image = await self.build_image(os.path.join(IMG_DIR, wife_name))
+                return [Plain(text_message), image]
+            cached_path = await image_cache.get_path(wife_name)
+            if cached_path:
+                return [Plain(text_message), await self.build_image(cached_path)]
+            return [Plain(f"{text_message}\n图片加载失败，请检查图片链接是否有效。")]
         except:
-            yield event.plain_result("无法获取用户信息，请检查消息事件对象。")
-            return
+            return [Plain(f"{text_message}\n图片加载失败，请稍后再试。")]
 
+    async def draw_wife(self, group_id, user_id, nickname):
+        """
+        抽取或读取用户当日老婆，需在群锁内调用。
+        返回 (老婆图片名, 错误提示)
+        """
         wife_name = None
         today = get_today()
         config = load_group_config(group_id)
 
         # 初始化用户数据结构
-        if str(user_id) not in config:
-            config[str(user_id)] = {
-                "current": {"wife_name": None, "date": ""},
-                "unlocked": [],
-                "nickname": nickname,
-            }
-        user_data = config[str(user_id)]
+        user_data = group_store.ensure_user(group_id, user_id, nickname)
 
         # 检查当日老婆是否有效
         if user_data["current"]["date"] == today:
-            wife_name = user_data["current"]["wife_name"]
-        else:
-            # 抽取新老婆
-            if os.listdir(IMG_DIR):
-                local_images = os.listdir(IMG_DIR)
-                wife_name = random.choice(local_images)
-            else:
-                try:
-                    response = requests.get(IMAGE_BASE_URL)
-                    if response.status_code == 200:
-                        image_list = response.text.splitlines()
-                        wife_name = random.choice(image_list) if image_list else None
-                    if not wife_name:
-                        yield event.plain_result("图片列表为空，请稍后再试。")
-                        return
-                except:
-                    yield event.plain_result("获取图片时发生错误，请稍后再试。")
-                    return
-
-            # 更新当日老婆
-            user_data["current"] = {"wife_name": wife_name, "date": today}
-
-            # 记录历史解锁（去重）
-            unlocked_wives = get_wife_names_from_unlocked(user_data["unlocked"])
-            if wife_name and wife_name not in unlocked_wives:
-                user_data["unlocked"].append(
-                    {"wife_name": wife_name, "unlock_date": today}
-                )
+            return user_data["current"]["wife_name"], None
 
-        # 解析并发送结果
-        name, source = parse_wife_name(wife_name)
-        if source != "未知":
-            text_message = (
-                f"{nickname}，你今天的二次元老婆是来自《{source}》的{name}哒~ "
-            )
+        # 抽取新老婆
+        local_images = (await wife_catalog.get_snapshot()).names
+        if local_images:
+            wife_name = random.choice(local_images)
         else:
-            text_message = f"{nickname}，你今天的二次元老婆是{name}哒~"
+            try:
+                image_list = await remote_catalog.get_names()
+                wife_name = random.choice(image_list) if image_list else None
+                if not wife_name:
+                    return None, "图片列表为空，请稍后再试。"
+            except:
+                return None, "获取图片时发生错误，请稍后再试。"
 
-        try:
-            # 尝试发送图片
-            if os.path.exists(os.path.join(IMG_DIR, wife_name)):
-                with open(os.path.join(IMG_DIR, wife_name), "rb") as f:
-                    image_data = f.read()
-                chain = [Plain(text_message), Image.fromBytes(image_data)]
-            else:
-                image_url = IMAGE_BASE_URL + wife_name
-                response = requests.get(image_url)
-                if response.status_code == 200:
-                    chain = [Plain(text_message), Image.fromBytes(response.content)]
-                else:
-                    chain = [
-                        Plain(f"{text_message}\n图片加载失败，请检查图片链接是否有效。")
-                    ]
-        except:
-            chain = [Plain(f"{text_message}\n图片加载失败，请稍后再试。")]
+        # 更新当日老婆
+        group_store.set_current(group_id, user_id, wife_name, today)
 
-        try:
-            yield event.chain_result(chain)
-        except:
-            yield event.plain_result(text_message)
+        # 记录历史解锁（去重）
+        group_store.record_unlock(group_id, user_id, wife_name, today)
 
         # 保存配置
         write_group_config(group_id, config)
+        return wife_name, None
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def ntr_wife(self, event: AstrMessageEvent):
-        """牛老婆 @user"""
-        # 检查消息是否包含指令关键词
-        if not event.message_str.strip().startswith("牛老婆"):
-            return
-
-        group_id = str(event.message_obj.group_id)
+    async def animewife(self, event: AstrMessageEvent, args: str = ""):
+        """随机抽取一张二次元老婆"""
+        group_id = event.message_obj.group_id
         if not group_id:
-            yield event.plain_result("该功能仅支持群聊，请在群聊中使用。")
-            return
-
-        if not ntr_statuses.get(group_id, False):
-            yield event.plain_result("NTR功能未开启！")
             return
 
         try:
@@ -381,6 +535,30 @@ class WifePlugin(Star):
             yield event.plain_result("无法获取用户信息，请检查消息事件对象。")
             return
 
+        async with group_store.lock(group_id):
+            wife_name, error = await self.draw_wife(group_id, user_id, nickname)
+        if error:
+            yield event.plain_result(error)
+            return
+
+        # 解析并发送结果
+        name, source = parse_wife_name(wife_name)
+        if source != "未知":
+            text_message = (
+                f"{nickname}，你今天的二次元老婆是来自《{source}》的{name}哒~ "
+            )
+        else:
+            text_message = f"{nickname}，你今天的二次元老婆是{name}哒~"
+
+        chain = await self.build_wife_chain(text_message, wife_name)
+
+        try:
+            yield event.chain_result(chain)
+        except:
+            yield event.plain_result(text_message)
+
+    def try_ntr(self, event, group_id, user_id, nickname, target_name=""):
+        """执行一次牛老婆并返回回复文本，需在群锁内调用"""
         # 每次操作前强制刷新当天日期，避免跨天问题
         today = get_today()
         # 获取用户今日NTR次数（明确从当天日期获取，默认0）
@@ -389,79 +567,78 @@ class WifePlugin(Star):
         today_count = user_ntr.get(today, 0)
 
         if today_count >= _ntr_max:
-            yield event.plain_result(
-                f"{nickname}，你今天已经牛了{_ntr_max}次，明日再来吧~"
-            )
-            return
+            return f"{nickname}，你今天已经牛了{_ntr_max}次，明日再来吧~"
 
-        target_id = self.parse_target(event)
+        target_id = self.parse_target(event, target_name)
         if not target_id:
-            yield event.plain_result(f"{nickname}，请指定一个要下手的目标~")
-            return
+            return f"{nickname}，请指定一个要下手的目标~"
 
         if user_id == target_id:
-            yield event.plain_result(f"{nickname}，不能对自己下手哦！")
-            return
+            return f"{nickname}，不能对自己下手哦！"
 
         config = load_group_config(group_id)
         if not config:
-            yield event.plain_result("未找到本群婚姻登记信息~")
-            return
+            return "未找到本群婚姻登记信息~"
 
         if str(target_id) not in config:
-            yield event.plain_result("对方还没有老婆哦~")
-            return
+            return "对方还没有老婆哦~"
 
         target_data = config[str(target_id)]
         if target_data["current"]["date"] != today:
-            yield event.plain_result("对方的老婆已过期，换个目标吧~")
-            return
+            return "对方的老婆已过期，换个目标吧~"
 
         # 增加NTR次数并保存
         user_ntr[today] = today_count + 1
-        save_ntr_data()
+        save_ntr_count(str(group_id), user_id, today)
 
         if random.random() < ntr_possibility:
             target_wife = target_data["current"]["wife_name"]
             # 更新当前用户的老婆
-            user_data = config.setdefault(
-                str(user_id),
-                {
-                    "current": {"wife_name": None, "date": ""},
-                    "unlocked": [],
-                    "nickname": nickname,
-                },
-            )
-            user_data["current"] = {"wife_name": target_wife, "date": today}
+            group_store.ensure_user(group_id, user_id, nickname)
+            group_store.set_current(group_id, user_id, target_wife, today)
             # 记录历史解锁
-            unlocked_wives = get_wife_names_from_unlocked(user_data["unlocked"])
-            if target_wife and target_wife not in unlocked_wives:
-                user_data["unlocked"].append(
-                    {"wife_name": target_wife, "unlock_date": today}
-                )
+            group_store.record_unlock(group_id, user_id, target_wife, today)
             # 清除目标用户的当日老婆
-            target_data["current"] = {"wife_name": None, "date": ""}
+            group_store.set_current(group_id, target_id, None, "")
+            group_store.log_ntr(group_id, user_id, target_id, True, today)
             write_group_config(group_id, config)
-            yield event.plain_result(f"{nickname}，恭喜你成功牛走了对方的老婆！")
-        else:
-            remaining = _ntr_max - (today_count + 1)
-            yield event.plain_result(
-                f"{nickname}，你的NTR计划失败了，还剩{remaining}次机会~"
-            )
+            return f"{nickname}，恭喜你成功牛走了对方的老婆！"
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def search_wife(self, event: AstrMessageEvent):
-        """查老婆 @user"""
-        # 检查消息是否包含指令关键词
-        if not event.message_str.strip().startswith("查老婆"):
+        group_store.log_ntr(group_id, user_id, target_id, False, today)
+        remaining = _ntr_max - (today_count + 1)
+        return f"{nickname}，你的NTR计划失败了，还剩{remaining}次机会~"
+
+    async def ntr_wife(self, event: AstrMessageEvent, args: str = ""):
+        """牛老婆 @user"""
+        group_id = str(event.message_obj.group_id)
+        if not group_id:
+            yield event.plain_result("该功能仅支持群聊，请在群聊中使用。")
+            return
+
+        if not ntr_statuses.get(group_id, False):
+            yield event.plain_result("NTR功能未开启！")
+            return
+
+        try:
+            user_id = str(event.get_sender_id())
+            nickname = event.get_sender_name() or "用户"
+        except:
+            yield event.plain_result("无法获取用户信息，请检查消息事件对象。")
             return
 
+        # 计数检查、目标校验与修改须在同一把群锁内完成，避免并发覆盖
+        async with group_store.lock(group_id):
+            reply = self.try_ntr(event, group_id, user_id, nickname, args)
+        yield event.plain_result(reply)
+
+    async def search_wife(self, event: AstrMessageEvent, args: str = ""):
+        """查老婆 @user"""
         group_id = event.message_obj.group_id
         if not group_id:
             yield event.plain_result("该功能仅支持群聊，请在群聊中使用。")
             return
 
-        target_id = self.parse_target(event)
+        target_id = self.parse_target(event, args)
         today = get_today()
 
         try:
@@ -488,7 +665,7 @@ class WifePlugin(Star):
         target_nickname = target_data.get("nickname") or "用户"
 
         # 获取解锁时间
-        unlock_date = get_unlock_date(target_data["unlocked"], wife_name)
+        unlock_date = group_store.get_unlock_date(group_id, target_id, wife_name)
         unlock_info = f"（解锁于{unlock_date}）" if unlock_date else ""
 
         if source != "未知":
@@ -496,34 +673,17 @@ class WifePlugin(Star):
         else:
             text_message = f"{target_nickname}的二次元老婆是{name}哒~{unlock_info}"
 
-        try:
-            # 尝试发送图片
-            if os.path.exists(os.path.join(IMG_DIR, wife_name)):
-                with open(os.path.join(IMG_DIR, wife_name), "rb") as f:
-                    image_data = f.read()
-                chain = [Plain(text_message), Image.fromBytes(image_data)]
-            else:
-                image_url = IMAGE_BASE_URL + wife_name
-                response = requests.get(image_url)
-                if response.status_code == 200:
-                    chain = [Plain(text_message), Image.fromBytes(response.content)]
-                else:
-                    chain = [
-                        Plain(f"{text_message}\n图片加载失败，请检查图片链接是否有效。")
-                    ]
-        except:
-            chain = [Plain(f"{text_message}\n图片加载失败，请稍后再试。")]
+        chain = await self.build_wife_chain(text_message, wife_name)
 
         try:
             yield event.chain_result(chain)
         except:
             yield event.plain_result(text_message)
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def switch_ntr(self, event: AstrMessageEvent):
+    async def switch_ntr(self, event: AstrMessageEvent, args: str = ""):
         """切换是否进入NTR状态"""
-        # 检查消息是否匹配指令
-        if event.message_str.strip() != "切换ntr状态":
+        # 指令须单独发送
+        if args:
             return
 
         group_id = str(event.message_obj.group_id)
@@ -543,15 +703,14 @@ class WifePlugin(Star):
             return
 
         ntr_statuses[group_id] = not ntr_statuses.get(group_id, False)
-        save_ntr_data()
+        save_ntr_status(group_id)
         status_text = "开启" if ntr_statuses[group_id] else "关闭"
         yield event.plain_result(f"NTR功能已{status_text}，请注意群内和谐~")
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def show_group_wife_gallery(self, event: AstrMessageEvent):
-        """查看群里已经解锁的老婆"""
-        # 检查消息是否匹配指令
-        if event.message_str.strip() != "群老婆图鉴":
+    async def show_group_wife_gallery(self, event: AstrMessageEvent, args: str = ""):
+        """查看群里已经解锁的老婆，参数为页码"""
+        page = parse_gallery_page(args)
+        if page is None:
             return
 
         group_id = event.message_obj.group_id
@@ -570,28 +729,53 @@ class WifePlugin(Star):
         try:
             from .anime_wife_collage import (
                 create_or_update_wife_gallery,
-                get_all_wife_images,
-                get_unlocked_wives,
+                gallery_extension,
             )
         except Exception as e:
             print(f"加载图鉴模块失败: {e}")
             yield event.plain_result("老婆图鉴功能加载失败，请稍后再试。")
             return
 
-        # 在后台线程中执行耗时的图鉴生成操作
-        loop = asyncio.get_event_loop()
-        gallery_path = os.path.join(GALLERY_DIR, f"gallery_{group_id}.png")
+        # 群图鉴每页按整行切分
+        catalog = await wife_catalog.get_snapshot()
+        page_size = gallery_page_size(per_row=10)
+        total_pages = gallery_page_count(len(catalog), page_size)
+        if page > total_pages:
+            yield event.plain_result(f"群老婆图鉴只有 {total_pages} 页哦~")
+            return
+
+        # 在渲染进程中执行耗时的图鉴生成操作，每页单独缓存
+        gallery_path = os.path.join(
+            GALLERY_DIR, f"gallery_{group_id}_p{page}{gallery_extension()}"
+        )
+
+        # 在事件循环中取得解锁集合，连同版本号一起交给渲染进程
+        unlocked_wives = group_store.get_unlocked_wives(group_id)
+        gallery_key = (group_store.unlock_version(group_id), catalog.version)
+        page_key = (str(group_id), page)
 
         try:
-            gallery_path = await loop.run_in_executor(
-                executor,
-                create_or_update_wife_gallery,
-                str(group_id),
-                IMG_DIR,
-                CONFIG_DIR,
-                BW_GALLERY_DIR,
-                gallery_path,
-            )
+            # 解锁集合与图片目录都未变化时直接发送上次的图鉴
+            if self.group_gallery_keys.get(page_key) != gallery_key or (
+                not os.path.exists(gallery_path)
+            ):
+                gallery_path = await render_service.submit(
+                    gallery_path,
+                    gallery_key,
+                    create_or_update_wife_gallery,
+                    str(group_id),
+                    IMG_DIR,
+                    CONFIG_DIR,
+                    BW_GALLERY_DIR,
+                    gallery_path,
+                    (80, 80),
+                    unlocked_wives,
+                    page,
+                    page_size,
+                    # 渲染进程的图片索引可能尚未发现目录变化，按主进程的索引为准
+                    catalog.fingerprint,
+                )
+                self.group_gallery_keys[page_key] = gallery_key
 
             # 检查图片是否生成成功
             if not os.path.exists(gallery_path):
@@ -599,29 +783,29 @@ class WifePlugin(Star):
                 return
 
             # 获取已解锁数量和总数量
-            all_wives = get_all_wife_images(IMG_DIR)
-            unlocked_wives = get_unlocked_wives(str(group_id), CONFIG_DIR)
             unlocked_count = len(unlocked_wives)
-            total_count = len(all_wives)
+            total_count = len(catalog)
 
             # 发送图鉴图片
-            with open(gallery_path, "rb") as f:
-                image_data = f.read()
+            image = await self.build_image(gallery_path)
 
             msg = (
                 f"{nickname}，本群老婆图鉴来啦~ 已解锁: {unlocked_count}/{total_count}"
             )
-            yield event.chain_result([Plain(msg), Image.fromBytes(image_data)])
+            if total_pages > 1:
+                msg += f"（第 {page}/{total_pages} 页）"
+            yield event.chain_result([Plain(msg), image])
 
+        except RenderBusy:
+            yield event.plain_result("图鉴生成任务较多，请稍后再试。")
         except Exception as e:
             print(f"生成图鉴失败: {e}")
             yield event.plain_result("生成图鉴失败，请稍后再试。")
 
-    @filter.event_message_type(EventMessageType.GROUP_MESSAGE)
-    async def show_personal_wife_gallery(self, event: AstrMessageEvent):
-        """查看已经解锁的老婆"""
-        # 检查消息是否匹配指令
-        if event.message_str.strip() != "老婆图鉴":
+    async def show_personal_wife_gallery(self, event: AstrMessageEvent, args: str = ""):
+        """查看已经解锁的老婆，参数为页码"""
+        page = parse_gallery_page(args)
+        if page is None:
             return
 
         group_id = event.message_obj.group_id
@@ -649,36 +833,59 @@ class WifePlugin(Star):
             return
 
         try:
-            from .anime_wife_collage import create_personal_wife_gallery
+            from .anime_wife_collage import (
+                create_personal_wife_gallery,
+                gallery_extension,
+            )
         except Exception as e:
             print(f"加载个人图鉴模块失败: {e}")
             yield event.plain_result("个人老婆图鉴功能加载失败，请稍后再试。")
             return
 
-        loop = asyncio.get_event_loop()
+        page_size = gallery_page_size()
+        total_pages = gallery_page_count(len(unlocked_wives), page_size)
+        if page > total_pages:
+            yield event.plain_result(f"你的老婆图鉴只有 {total_pages} 页哦~")
+            return
+
+        # 按群、用户和页码区分，同一用户在不同群的图鉴互不覆盖
         personal_gallery_path = os.path.join(
-            GALLERY_DIR, f"personal_gallery_{user_id}.png"
+            GALLERY_DIR,
+            f"personal_gallery_{group_id}_{user_id}_p{page}{gallery_extension()}",
         )
+        # 解锁列表只会在末尾追加，数量不变即内容不变
+        gallery_key = (str(group_id), user_id, page)
 
         try:
-            personal_gallery_path = await loop.run_in_executor(
-                executor,
-                create_personal_wife_gallery,
-                unlocked_wives,
-                IMG_DIR,
-                personal_gallery_path,
-            )
+            if self.personal_gallery_keys.get(gallery_key) != len(
+                unlocked_wives
+            ) or not os.path.exists(personal_gallery_path):
+                personal_gallery_path = await render_service.submit(
+                    personal_gallery_path,
+                    len(unlocked_wives),
+                    create_personal_wife_gallery,
+                    unlocked_wives,
+                    IMG_DIR,
+                    personal_gallery_path,
+                    (80, 80),
+                    page,
+                    page_size,
+                )
+                self.personal_gallery_keys[gallery_key] = len(unlocked_wives)
 
             if not os.path.exists(personal_gallery_path):
                 yield event.plain_result("个人图鉴生成失败，未找到图片文件。")
                 return
 
-            with open(personal_gallery_path, "rb") as f:
-                image_data = f.read()
+            image = await self.build_image(personal_gallery_path)
 
             msg = f"{nickname}，你的个人老婆图鉴来啦~ 已解锁: {len(unlocked_wives)}"
-            yield event.chain_result([Plain(msg), Image.fromBytes(image_data)])
+            if total_pages > 1:
+                msg += f"（第 {page}/{total_pages} 页）"
+            yield event.chain_result([Plain(msg), image])
 
+        except RenderBusy:
+            yield event.plain_result("图鉴生成任务较多，请稍后再试。")
         except Exception as e:
             print(f"生成个人图鉴失败: {e}")
             yield event.plain_result("生成个人图鉴失败，请稍后再试。")
@@ -686,53 +893,9 @@ class WifePlugin(Star):
 
 # 加载群配置数据，兼容旧格式
 def load_group_config(group_id: str):
-    filename = os.path.join(CONFIG_DIR, f"{group_id}.json")
-    try:
-        with open(filename, encoding="utf-8") as f:
-            config = json.load(f)
-            # 兼容旧格式数据
-            for user_id in list(config.keys()):
-                user_data = config[user_id]
-                if isinstance(user_data, list):
-                    # 旧格式：列表格式
-                    if len(user_data) >= 2:
-                        old_wife = user_data[0]
-                        old_date = user_data[1]
-                        old_nick = user_data[2] if len(user_data) > 2 else "用户"
-                        config[user_id] = {
-                            "current": {"wife_name": old_wife, "date": old_date},
-                            "unlocked": [
-                                {"wife_name": old_wife, "unlock_date": old_date}
-                            ],
-                            "nickname": old_nick,
-                        }
-                else:
-                    # 检查 unlocked 格式是否需要升级
-                    if "unlocked" in user_data and isinstance(
-                        user_data["unlocked"], list
-                    ):
-                        if user_data["unlocked"] and isinstance(
-                            user_data["unlocked"][0], str
-                        ):
-                            # 升级旧格式的 unlocked 列表
-                            user_data["unlocked"] = upgrade_unlocked_format(
-                                user_data["unlocked"]
-                            )
-            return config
-    except Exception as e:
-        print(f"加载群配置失败: {e}")
-        return {}
+    return group_store.load(group_id)
 
 
 # 写入群配置数据
 def write_group_config(group_id: str, config: dict):
-    config_file = os.path.join(CONFIG_DIR, f"{group_id}.json")
-    try:
-        with open(config_file, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"保存群配置失败: {e}")
-
-
-# 程序启动时加载NTR数据
-load_ntr_data()
+    group_store.save(group_id, config)
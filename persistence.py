@@ -0,0 +1,184 @@
+import asyncio
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Set, Tuple
+
+from .serializers import MODE_PRETTY, dumps
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，仅保证单进程内安全
+    fcntl = None
+
+# 落盘模式：延迟合并写入 / 每次修改立即写入
+MODE_WRITE_BEHIND = "write_behind"
+MODE_WRITE_THROUGH = "write_through"
+
+
+def encode_json(data: Any) -> bytes:
+    """将数据编码为 JSON 字节"""
+    return dumps(data, MODE_PRETTY)
+
+
+def atomic_write_bytes(path: str, payload: bytes, fsync: bool = False) -> None:
+    """先写临时文件再重命名，保证崩溃时不会留下截断的文件"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class FileLock:
+    """跨进程的文件锁（不支持时退化为空操作）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+class WriteBehindWriter:
+    """
+    延迟写入器：
+    1. 修改只标记为脏，同一文件的多次修改合并为一次写入
+    2. 按时间间隔、脏条目数量阈值以及插件关闭时刷新
+    3. 序列化在事件循环中完成（取得一致快照），文件写入放到线程池
+    """
+
+    def __init__(
+        self,
+        mode: str = MODE_WRITE_BEHIND,
+        interval: float = 5.0,
+        max_dirty: int = 64,
+        fsync: bool = False,
+        encode: Callable[[Any], bytes] = encode_json,
+    ):
+        self.mode = mode
+        # 写入文件时使用的编码函数
+        self.encode = encode
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.fsync = fsync
+        # key -> (文件路径, 获取当前数据的函数)
+        self._dirty: Dict[str, Tuple[str, Callable[[], Any]]] = {}
+        # 已取出快照、正在写入的 key
+        self._writing: Set[str] = set()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = None
+        self._wake = None
+        self._task = None
+        self._closed = False
+
+    def is_dirty(self, key: str) -> bool:
+        return key in self._dirty or key in self._writing
+
+    def mark_dirty(self, key: str, path: str, getter: Callable[[], Any]) -> None:
+        """标记数据待写入，getter 在真正写入时才被调用"""
+        self._dirty[key] = (path, getter)
+        if self.mode != MODE_WRITE_BEHIND or self._closed:
+            self.flush_sync()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中（如脚本调用），直接写入
+            self.flush_sync()
+            return
+        self._ensure_task(loop)
+        if len(self._dirty) >= self.max_dirty:
+            self._wake.set()
+
+    def _ensure_task(self, loop) -> None:
+        if self._task is None or self._task.done():
+            self._flush_lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def _take(self):
+        pending, self._dirty = self._dirty, {}
+        encoded = []
+        for key, (path, getter) in pending.items():
+            try:
+                encoded.append((key, path, getter, self.encode(getter())))
+                self._writing.add(key)
+            except Exception as e:
+                print(f"序列化数据失败: {path}, 错误: {e}")
+        return encoded
+
+    async def flush(self) -> None:
+        """将所有脏数据写入磁盘"""
+        if not self._dirty:
+            return
+        loop = asyncio.get_running_loop()
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            for key, path, getter, payload in self._take():
+                try:
+                    await loop.run_in_executor(
+                        None, atomic_write_bytes, path, payload, self.fsync
+                    )
+                except Exception as e:
+                    print(f"写入数据失败: {path}, 错误: {e}")
+                    # 写入失败则保留脏标记，等待下次重试
+                    self._dirty.setdefault(key, (path, getter))
+                finally:
+                    self._writing.discard(key)
+
+    def flush_sync(self) -> None:
+        """在当前线程同步写入所有脏数据"""
+        with self._sync_lock:
+            for key, path, getter, payload in self._take():
+                try:
+                    atomic_write_bytes(path, payload, self.fsync)
+                except Exception as e:
+                    print(f"写入数据失败: {path}, 错误: {e}")
+                finally:
+                    self._writing.discard(key)
+
+    async def close(self) -> None:
+        """停止后台刷新并写入剩余数据"""
+        self._closed = True
+        if self._task is not None:
+            self._wake.set()
+            try:
+                await self._task
+            except Exception as e:
+                print(f"后台写入任务异常: {e}")
+            self._task = None
+            await self.flush()
+        self.flush_sync()
@@ -0,0 +1,98 @@
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Tuple
+
+from PIL import Image
+
+from .persistence import atomic_write_bytes
+
+# 原始大图文件扩展名
+RAW_ATLAS_EXT = ".raw"
+# 文件头：魔数、宽、高、通道数，之后紧跟按行排列的 uint8 像素
+_MAGIC = b"AWATLAS1"
+_HEADER = struct.Struct("<8sIII")
+# 彩色按 RGBX（每像素 4 字节）保存：PIL 只对 L / RGBX 等模式直接映射缓冲区，
+# RGB 会在 frombuffer 时解包拷贝
+_MODES = {1: "L", 4: "RGBX"}
+
+
+def save_raw_atlas(image: Image.Image, path: str) -> None:
+    """把图片保存为带文件头的原始像素文件（L 保持单通道，其余存为 RGBX）"""
+    if image.mode not in ("L", "RGBX"):
+        image = image.convert("RGBX")
+    bands = len(image.getbands())
+    header = _HEADER.pack(_MAGIC, image.width, image.height, bands)
+    atomic_write_bytes(path, header + image.tobytes())
+
+
+class RawAtlas:
+    """
+    内存映射的原始像素大图：
+    不需要解压，按行切片后直接交给 PIL，只读取实际用到的行。
+    Windows 下映射中的文件无法被替换，因此改为整体读入内存。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.name == "nt":
+                self._buffer = f.read()
+            else:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, width, height, bands = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC or bands not in _MODES:
+            raise ValueError(f"不是有效的原始大图文件: {path}")
+        self.size = (width, height)
+        self.mode = _MODES[bands]
+        self.row_bytes = width * bands
+        if len(self._buffer) < _HEADER.size + self.row_bytes * height:
+            raise ValueError(f"原始大图文件不完整: {path}")
+
+    def rows(self, top: int, bottom: int) -> Image.Image:
+        """取 [top, bottom) 行组成的图片（直接引用映射的像素，不拷贝）"""
+        top = max(0, top)
+        bottom = min(self.size[1], bottom)
+        start = _HEADER.size + top * self.row_bytes
+        view = memoryview(self._buffer)[start : start + (bottom - top) * self.row_bytes]
+        return Image.frombuffer(
+            self.mode, (self.size[0], bottom - top), view, "raw", self.mode, 0, 1
+        )
+
+    def image(self) -> Image.Image:
+        """整张大图"""
+        return self.rows(0, self.size[1])
+
+
+_atlases: Dict[str, Tuple[Tuple[int, int], RawAtlas]] = {}
+_atlases_lock = threading.Lock()
+
+
+def open_raw_atlas(path: str) -> RawAtlas:
+    """打开原始大图，文件未被替换时复用已有映射"""
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_mtime_ns)
+    with _atlases_lock:
+        cached = _atlases.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        # 旧映射在没有图片引用后由垃圾回收释放
+        atlas = RawAtlas(path)
+        _atlases[path] = (key, atlas)
+        return atlas
+
+
+def is_raw_atlas(path: str) -> bool:
+    """文件存在且是当前格式的原始大图（旧版本的 RGB 文件返回 False）"""
+    try:
+        open_raw_atlas(path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def forget_raw_atlas(path: str) -> None:
+    """丢弃缓存的映射（在替换文件前调用）"""
+    with _atlases_lock:
+        _atlases.pop(path, None)
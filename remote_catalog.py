@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+from .http_client import AsyncHttpClient
+from .persistence import atomic_write_bytes, encode_json
+
+# 远程列表的刷新间隔（秒）
+CATALOG_TTL = 3600
+# 刷新失败后的重试间隔（秒）
+CATALOG_RETRY_INTERVAL = 300
+# 还没有任何列表时，失败后的重试间隔（秒），期间的抽取直接返回上次的错误
+CATALOG_COLD_RETRY_INTERVAL = 5
+
+
+class RemoteCatalog:
+    """
+    远程图床的老婆列表缓存：
+    1. 解析后的列表常驻内存，并持久化到磁盘，重启后无需联网即可抽取
+    2. 过期后在后台用 ETag / If-Modified-Since 条件请求刷新
+    3. 图床不可用时继续使用最后一次成功获取的列表
+    4. 还没有列表时按需重试（间隔很短），获取失败会抛出异常而不是返回空列表
+    """
+
+    def __init__(
+        self,
+        url: str,
+        cache_path: str,
+        http: AsyncHttpClient,
+        ttl: float = CATALOG_TTL,
+    ):
+        self.url = url
+        self.cache_path = cache_path
+        self.http = http
+        self.ttl = ttl
+        self.names: List[str] = []
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self._next_refresh = 0.0
+        # 最近一次刷新失败的原因，成功后清除
+        self._last_error: Optional[Exception] = None
+        self._load_future = None
+        self._refresh_task = None
+        self._refresh_lock = None
+
+    def _load_disk(self) -> None:
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.names = data.get("names", [])
+            self.etag = data.get("etag")
+            self.last_modified = data.get("last_modified")
+            if self.names:
+                self._next_refresh = data.get("fetched_at", 0.0) + self.ttl
+        except Exception as e:
+            print(f"加载远程图片列表缓存失败: {e}")
+
+    def _save_disk(self, fetched_at: float) -> None:
+        data = {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": fetched_at,
+            "names": self.names,
+        }
+        try:
+            atomic_write_bytes(self.cache_path, encode_json(data))
+        except Exception as e:
+            print(f"保存远程图片列表缓存失败: {e}")
+
+    async def load(self) -> None:
+        """从磁盘加载上次保存的列表（只执行一次）"""
+        if self._load_future is None:
+            self._load_future = asyncio.get_running_loop().run_in_executor(
+                None, self._load_disk
+            )
+        await self._load_future
+
+    async def refresh(self) -> None:
+        """条件请求远程列表，失败时保留现有列表"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            now = time.time()
+            if now < self._next_refresh:
+                # 等锁期间已被其他请求刷新（或刚刚失败过）
+                return
+            retry_interval = (
+                CATALOG_RETRY_INTERVAL if self.names else CATALOG_COLD_RETRY_INTERVAL
+            )
+            headers = {}
+            if self.names and self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.names and self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+            try:
+                response = await self.http.request(self.url, headers=headers)
+            except Exception as e:
+                print(f"刷新远程图片列表失败: {e}")
+                self._last_error = e
+                self._next_refresh = now + retry_interval
+                return
+
+            if response.status == 304:
+                self._next_refresh = now + self.ttl
+            elif response.status == 200:
+                names = [line for line in response.text.splitlines() if line.strip()]
+                if names:
+                    self.names = names
+                self.etag = response.headers.get("ETag")
+                self.last_modified = response.headers.get("Last-Modified")
+                # 图床返回空列表时也尽快重试
+                self._next_refresh = now + (self.ttl if self.names else retry_interval)
+            else:
+                print(f"刷新远程图片列表失败: HTTP {response.status}")
+                self._last_error = RuntimeError(f"HTTP {response.status}")
+                self._next_refresh = now + retry_interval
+                return
+            self._last_error = None
+            await asyncio.get_running_loop().run_in_executor(None, self._save_disk, now)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+
+    async def get_names(self) -> List[str]:
+        """
+        获取老婆列表。
+        已有列表时立即返回，过期则在后台刷新；只有冷启动且无缓存时才等待网络，
+        此时获取失败会抛出异常。
+        """
+        await self.load()
+        if not self.names:
+            await self.refresh()
+            if not self.names and self._last_error is not None:
+                raise self._last_error
+        elif time.time() >= self._next_refresh:
+            self._schedule_refresh()
+        return self.names
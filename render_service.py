@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 渲染进程数，None 表示与 CPU 核数相同
+RENDER_WORKERS = None
+# 同时排队与执行中的渲染任务上限，超出时直接返回繁忙
+RENDER_QUEUE_LIMIT = 16
+# 是否使用进程池（Windows 下或关闭时改用线程池）
+RENDER_USE_PROCESSES = True
+# 进程启动方式，spawn 避免在已有线程的进程中 fork
+RENDER_START_METHOD = "spawn"
+
+
+class RenderBusy(Exception):
+    """渲染队列已满"""
+
+
+class RenderService:
+    """
+    图鉴渲染服务：
+    1. 渲染在独立的进程池中执行，像素处理不再与事件循环争抢 GIL
+    2. 同一张图鉴（key 相同）的并发请求共用一个任务；
+       输入已变化（version 不同）时等待旧任务结束后再渲染
+    3. 排队与执行中的任务数达到上限时立即抛出 RenderBusy
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = RENDER_WORKERS,
+        queue_limit: int = RENDER_QUEUE_LIMIT,
+        use_processes: bool = RENDER_USE_PROCESSES,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.use_processes = use_processes and os.name != "nt"
+        self._executor: Optional[Executor] = None
+        # key -> (version, future)
+        self._pending: Dict[Hashable, Tuple[Any, asyncio.Future]] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                try:
+                    context = multiprocessing.get_context(RENDER_START_METHOD)
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=context
+                    )
+                    return self._executor
+                except Exception as e:
+                    print(f"创建渲染进程池失败，改用线程池: {e}")
+                    self.use_processes = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        entry = self._pending.get(key)
+        if entry is not None and entry[1] is future:
+            del self._pending[key]
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # 工作进程异常退出，下次渲染时重建进程池
+            print("渲染进程池已损坏，将重新创建")
+            self._executor = None
+
+    async def submit(self, key: Hashable, version: Any, func: Callable, *args) -> Any:
+        """提交渲染任务并等待结果，队列已满时抛出 RenderBusy"""
+        while True:
+            entry = self._pending.get(key)
+            if entry is None:
+                break
+            if entry[0] == version:
+                return await asyncio.shield(entry[1])
+            # 同一张图鉴正在按旧输入渲染，等它写完再覆盖
+            try:
+                await asyncio.shield(entry[1])
+            except Exception:
+                pass
+
+        if len(self._pending) >= self.queue_limit:
+            raise RenderBusy()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_executor(), func, *args)
+        self._pending[key] = (version, future)
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return await asyncio.shield(future)
+
+    def shutdown(self) -> None:
+        """关闭进程池，未开始的任务直接取消"""
+        if self._executor is not None:
+            if sys.version_info >= (3, 9):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                # Python 3.8 的 shutdown 不支持 cancel_futures，逐个取消排队中的任务；
+                # 已开始执行的任务照常完成，只是等待方不再等结果
+                for _, future in list(self._pending.values()):
+                    future.cancel()
+                self._executor.shutdown(wait=False)
+            self._executor = None
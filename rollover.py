@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from .group_store import next_midnight
+
+# 零点后延迟触发的秒数，避免时钟误差导致仍取到前一天的日期
+ROLLOVER_DELAY = 1.0
+# 单次休眠的最长秒数，系统休眠或校时后能及时重新计算等待时间
+MAX_SLEEP = 600.0
+
+
+class DailyScheduler:
+    """
+    每日换日调度：在上海时区零点后调用一次回调。
+    回调抛出的异常只打印，不影响下一天的调度。
+    """
+
+    def __init__(self, callback: Callable[[], Awaitable[None]]):
+        self.callback = callback
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            due = next_midnight() + ROLLOVER_DELAY
+            while True:
+                remaining = due - time.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, MAX_SLEEP))
+            try:
+                await self.callback()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"每日换日任务失败: {e}")
@@ -0,0 +1,62 @@
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 序列化模式：
+# "pretty"  缩进的 JSON（便于手工查看与修改）
+# "compact" 无缩进的 JSON，安装了 orjson 时用 orjson 编码
+# "msgpack" 二进制 msgpack（需安装 msgpack，否则退回 compact）
+MODE_PRETTY = "pretty"
+MODE_COMPACT = "compact"
+MODE_MSGPACK = "msgpack"
+
+# UTF-8 BOM 与 JSON 可能的首字符，用于读取时识别格式
+_BOM = b"\xef\xbb\xbf"
+_JSON_START = b'{["-0123456789tfn'
+
+
+def dumps(data: Any, mode: str = MODE_PRETTY) -> bytes:
+    """按模式把数据编码为字节"""
+    if mode == MODE_MSGPACK and msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+    if mode in (MODE_COMPACT, MODE_MSGPACK):
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def loads(payload: bytes) -> Any:
+    """解码任意模式写出的数据：以 JSON 字符开头的按 JSON 解析，否则按 msgpack 解析"""
+    if payload.startswith(_BOM):
+        payload = payload[len(_BOM) :]
+    head = payload.lstrip()[:1]
+    if not head or head in _JSON_START:
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload.decode("utf-8"))
+    if msgpack is None:
+        raise ValueError("数据为 msgpack 格式，但未安装 msgpack")
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+def load_file(path: str) -> Any:
+    """读取并解码文件（自动识别格式）"""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def get_encoder(mode: str) -> Callable[[Any], bytes]:
+    """返回指定模式的编码函数，供写入器使用"""
+    return lambda data: dumps(data, mode)
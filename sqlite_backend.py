@@ -0,0 +1,325 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from .group_store import upgrade_group_config, upgrade_ntr_limit_format
+from .serializers import load_file
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    nickname TEXT,
+    PRIMARY KEY (group_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS current (
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    wife_name TEXT,
+    date TEXT NOT NULL,
+    PRIMARY KEY (group_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS unlocks (
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    wife_name TEXT NOT NULL,
+    unlock_date TEXT,
+    PRIMARY KEY (group_id, user_id, wife_name)
+);
+CREATE INDEX IF NOT EXISTS unlocks_by_seq ON unlocks (group_id, user_id, seq);
+CREATE INDEX IF NOT EXISTS unlocks_by_wife ON unlocks (group_id, wife_name);
+CREATE TABLE IF NOT EXISTS ntr_status (
+    group_id TEXT PRIMARY KEY,
+    enabled INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ntr_counts (
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (group_id, user_id, date)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 迁移完成标记
+_MIGRATED_KEY = "migrated_from_json"
+
+
+class SqliteBackend:
+    """
+    SQLite 存储后端（WAL 模式）：
+    1. 用户、当日老婆、解锁记录与 NTR 数据分表保存，并建有索引
+    2. GroupStore 的每次修改只写入对应的一行（upsert），不再整群重写
+    3. 连接在首次使用时打开，插件导入时不访问磁盘
+    提供与 JsonGroupBackend 相同的接口，可直接传给 GroupStore。
+    """
+
+    def __init__(self, db_path: str, synchronous: str = "NORMAL"):
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self._conn: Optional[sqlite3.Connection] = None
+        # 连接在事件循环与线程池间共用
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        with self._lock:
+            self._connect().execute(sql, params)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---- 群配置 ----
+
+    def read(self, group_id: str) -> dict:
+        """组装与 JSON 文件相同结构的群配置"""
+        config = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                users = conn.execute(
+                    "SELECT user_id, nickname FROM users WHERE group_id = ?",
+                    (group_id,),
+                ).fetchall()
+                currents = conn.execute(
+                    "SELECT user_id, wife_name, date FROM current WHERE group_id = ?",
+                    (group_id,),
+                ).fetchall()
+                unlocks = conn.execute(
+                    "SELECT user_id, wife_name, unlock_date FROM unlocks"
+                    " WHERE group_id = ? ORDER BY user_id, seq",
+                    (group_id,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"加载群配置失败: {e}")
+            return {}
+        for user_id, nickname in users:
+            config[user_id] = {
+                "current": {"wife_name": None, "date": ""},
+                "unlocked": [],
+                "nickname": nickname,
+            }
+        for user_id, wife_name, date in currents:
+            if user_id in config:
+                config[user_id]["current"] = {"wife_name": wife_name, "date": date}
+        for user_id, wife_name, unlock_date in unlocks:
+            if user_id in config:
+                config[user_id]["unlocked"].append(
+                    {"wife_name": wife_name, "unlock_date": unlock_date}
+                )
+        return config
+
+    def save(self, group_id: str, config: dict) -> None:
+        # 修改已由行级操作写入
+        pass
+
+    def is_dirty(self, group_id: str) -> bool:
+        return False
+
+    def upsert_user(self, group_id: str, user_id: str, nickname: str) -> None:
+        self._execute(
+            "INSERT INTO users (group_id, user_id, nickname) VALUES (?, ?, ?)"
+            " ON CONFLICT (group_id, user_id) DO UPDATE SET nickname = excluded.nickname",
+            (group_id, user_id, nickname),
+        )
+
+    def set_current(
+        self, group_id: str, user_id: str, wife_name: Optional[str], date: str
+    ) -> None:
+        self._execute(
+            "INSERT INTO current (group_id, user_id, wife_name, date) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (group_id, user_id) DO UPDATE"
+            " SET wife_name = excluded.wife_name, date = excluded.date",
+            (group_id, user_id, wife_name, date),
+        )
+
+    def add_unlock(
+        self, group_id: str, user_id: str, seq: int, wife_name: str, unlock_date: str
+    ) -> None:
+        self._execute(
+            "INSERT OR IGNORE INTO unlocks"
+            " (group_id, user_id, seq, wife_name, unlock_date) VALUES (?, ?, ?, ?, ?)",
+            (group_id, user_id, seq, wife_name, unlock_date),
+        )
+
+    def log_ntr(
+        self,
+        group_id: str,
+        config: dict,
+        user_id: str,
+        target_id: str,
+        success: bool,
+        date: str,
+    ) -> None:
+        pass
+
+    def pending_groups(self) -> List[str]:
+        return []
+
+    def compact(self, group_id: str, config: dict) -> None:
+        pass
+
+    # ---- NTR ----
+
+    def load_ntr(self) -> Tuple[Dict[str, bool], Dict[str, Dict[str, Dict[str, int]]]]:
+        """读取 NTR 开关与次数，结构与 JSON 文件相同"""
+        with self._lock:
+            conn = self._connect()
+            statuses = {
+                group_id: bool(enabled)
+                for group_id, enabled in conn.execute(
+                    "SELECT group_id, enabled FROM ntr_status"
+                )
+            }
+            limits: Dict[str, Dict[str, Dict[str, int]]] = {}
+            for group_id, user_id, date, count in conn.execute(
+                "SELECT group_id, user_id, date, count FROM ntr_counts"
+            ):
+                limits.setdefault(group_id, {}).setdefault(user_id, {})[date] = count
+        return statuses, limits
+
+    def set_ntr_status(self, group_id: str, enabled: bool) -> None:
+        self._execute(
+            "INSERT INTO ntr_status (group_id, enabled) VALUES (?, ?)"
+            " ON CONFLICT (group_id) DO UPDATE SET enabled = excluded.enabled",
+            (group_id, int(enabled)),
+        )
+
+    def set_ntr_count(self, group_id: str, user_id: str, date: str, count: int) -> None:
+        self._execute(
+            "INSERT INTO ntr_counts (group_id, user_id, date, count) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (group_id, user_id, date) DO UPDATE SET count = excluded.count",
+            (group_id, user_id, date, count),
+        )
+
+    def purge_ntr_counts(self, keep_date: str) -> None:
+        """删除非 keep_date 当天的 NTR 次数"""
+        self._execute("DELETE FROM ntr_counts WHERE date != ?", (keep_date,))
+
+    # ---- 迁移 ----
+
+    def migrate_from_json(
+        self, config_dir: str, ntr_status_file: str, ntr_limit_file: str
+    ) -> bool:
+        """
+        一次性把 JSON 数据导入数据库（沿用旧格式升级逻辑），已迁移过时直接返回 False。
+        原 JSON 文件保持不变，可作为备份。
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn.execute(
+                "SELECT 1 FROM meta WHERE key = ?", (_MIGRATED_KEY,)
+            ).fetchone():
+                return False
+            conn.execute("BEGIN")
+            try:
+                # NTR 文件与群配置放在同一目录，导入群配置时跳过
+                skip = {
+                    os.path.abspath(ntr_status_file),
+                    os.path.abspath(ntr_limit_file),
+                }
+                self._import_groups(conn, config_dir, skip)
+                self._import_ntr(conn, ntr_status_file, ntr_limit_file)
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, '1')", (_MIGRATED_KEY,)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _import_groups(
+        self, conn: sqlite3.Connection, config_dir: str, skip: Set[str]
+    ) -> None:
+        if not os.path.isdir(config_dir):
+            return
+        for filename in os.listdir(config_dir):
+            path = os.path.join(config_dir, filename)
+            if not filename.endswith(".json") or os.path.abspath(path) in skip:
+                continue
+            group_id = filename[: -len(".json")]
+            try:
+                config = upgrade_group_config(load_file(path))
+            except Exception as e:
+                print(f"迁移群配置失败: {filename}, 错误: {e}")
+                continue
+            if not isinstance(config, dict):
+                continue
+            for user_id, user_data in config.items():
+                if not isinstance(user_data, dict):
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+                    (group_id, user_id, user_data.get("nickname")),
+                )
+                current = user_data.get("current") or {}
+                conn.execute(
+                    "INSERT OR REPLACE INTO current VALUES (?, ?, ?, ?)",
+                    (
+                        group_id,
+                        user_id,
+                        current.get("wife_name"),
+                        current.get("date", ""),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO unlocks VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            group_id,
+                            user_id,
+                            seq,
+                            item["wife_name"],
+                            item.get("unlock_date"),
+                        )
+                        for seq, item in enumerate(user_data.get("unlocked") or [])
+                    ],
+                )
+
+    def _import_ntr(
+        self, conn: sqlite3.Connection, ntr_status_file: str, ntr_limit_file: str
+    ) -> None:
+        if os.path.exists(ntr_status_file):
+            try:
+                statuses = load_file(ntr_status_file)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO ntr_status VALUES (?, ?)",
+                    [(g, int(bool(enabled))) for g, enabled in statuses.items()],
+                )
+            except Exception as e:
+                print(f"迁移NTR状态失败: {e}")
+        if os.path.exists(ntr_limit_file):
+            try:
+                limits = upgrade_ntr_limit_format(load_file(ntr_limit_file))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO ntr_counts VALUES (?, ?, ?, ?)",
+                    [
+                        (g, u, date, count)
+                        for g, users in limits.items()
+                        for u, dates in users.items()
+                        for date, count in dates.items()
+                    ],
+                )
+            except Exception as e:
+                print(f"迁移NTR次数失败: {e}")
@@ -0,0 +1,223 @@
+import json
+import mmap
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from .persistence import FileLock, atomic_write_bytes, encode_json
+
+# 数据文件达到该大小且失效图块占比超过 THUMBNAIL_COMPACT_RATIO 时重写数据文件
+THUMBNAIL_COMPACT_MIN_BYTES = 16 * 1024 * 1024
+THUMBNAIL_COMPACT_RATIO = 0.5
+
+
+class ThumbnailStore:
+    """
+    持久化的缩略图仓库：
+    1. 所有缩略图以解码后的 RGB 原始字节追加到同一个数据文件，读取时经 mmap 直接拷贝
+    2. 索引以源图片绝对路径为键，记录修改时间与在数据文件中的偏移
+    3. 未命中时先在文件锁内重新读取索引，其他进程刚生成的缩略图不会重复生成
+    4. 源图片修改后重新生成并追加，失效图块过多时由 save 重写数据文件（代号加一），
+       其他进程读取索引时发现代号变化即切换到新数据文件
+    数据文件与索引按缩略图尺寸区分，不同尺寸互不影响。
+    """
+
+    def __init__(self, cache_dir: str, thumbnail_size: Tuple[int, int]):
+        self.cache_dir = cache_dir
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.tile_bytes = self.thumbnail_size[0] * self.thumbnail_size[1] * 3
+        self.name = f"thumbnails_{self.thumbnail_size[0]}x{self.thumbnail_size[1]}"
+        self.index_path = os.path.join(cache_dir, self.name + ".json")
+        self.lock_path = os.path.join(cache_dir, self.name + ".lock")
+        # 数据文件代号，每次重写加一
+        self._generation = 0
+        # 源图片路径 -> [修改时间(纳秒), 偏移]
+        self._index: Dict[str, List[int]] = {}
+        self._pending: Dict[str, List[int]] = {}
+        # 最近一次读取时索引文件的 (修改时间, 大小)，未变化时不重复读取
+        self._index_stamp: Optional[Tuple[int, int]] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._mmap_size = 0
+        self._lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._lock:
+            self._load_index()
+
+    def _data_path(self, generation: int) -> str:
+        # 代号 0 沿用旧版本的文件名
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.cache_dir, f"{self.name}{suffix}.bin")
+
+    @property
+    def data_path(self) -> str:
+        return self._data_path(self._generation)
+
+    def _stat_index(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self) -> None:
+        """读取索引（须持有 self._lock），代号变化时切换数据文件并丢弃未保存的新增"""
+        stamp = self._stat_index()
+        if stamp is None or stamp == self._index_stamp:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"读取缩略图索引失败: {e}")
+            return
+        self._index_stamp = stamp
+        if isinstance(data.get("generation"), int) and "tiles" in data:
+            generation, tiles = data["generation"], data["tiles"]
+        else:
+            # 旧版本的索引：直接是 路径 -> 条目
+            generation, tiles = 0, data
+        if generation != self._generation:
+            # 新增的图块写在已被重写掉的数据文件中，下次使用时重新生成
+            self._generation = generation
+            self._pending = {}
+            self._remap()
+        self._index = tiles
+
+    def _write_index(self) -> None:
+        payload = {"generation": self._generation, "tiles": self._index}
+        atomic_write_bytes(self.index_path, encode_json(payload))
+        self._index_stamp = self._stat_index()
+
+    def _remap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        path = self.data_path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._mmap_size = size
+        if size:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_tile(self, offset: int) -> bytes:
+        """读取当前数据文件指定偏移处的一个图块的原始字节"""
+        with self._lock:
+            if offset + self.tile_bytes > self._mmap_size:
+                # 数据文件已被追加（本进程或其他进程）
+                self._remap()
+            if offset + self.tile_bytes > self._mmap_size:
+                raise ValueError(f"缩略图偏移超出数据文件: {offset}")
+            return self._mmap[offset : offset + self.tile_bytes]
+
+    def _lookup(self, key: str, mtime_ns: int) -> Optional[Image.Image]:
+        # 须持有 self._lock，保证偏移与数据文件属于同一代号
+        entry = self._pending.get(key) or self._index.get(key)
+        if not entry or entry[0] != mtime_ns:
+            return None
+        data = self.read_tile(entry[1])
+        return Image.frombytes("RGB", self.thumbnail_size, data)
+
+    def get(
+        self, img_path: str, render: Callable[[str, tuple], Image.Image]
+    ) -> Image.Image:
+        """获取源图片的缩略图，不存在或已过期时调用 render 生成并追加"""
+        key = os.path.abspath(img_path)
+        mtime_ns = os.stat(key).st_mtime_ns
+        with self._lock:
+            try:
+                thumb = self._lookup(key, mtime_ns)
+            except (OSError, ValueError):
+                # 数据文件可能已被其他进程重写，重新读取索引后再试
+                thumb = None
+            if thumb is not None:
+                return thumb
+        with FileLock(self.lock_path):
+            with self._lock:
+                self._load_index()
+                thumb = self._lookup(key, mtime_ns)
+                if thumb is not None:
+                    return thumb
+        thumb = render(key, self.thumbnail_size).convert("RGB")
+        with FileLock(self.lock_path):
+            with self._lock:
+                # 渲染期间数据文件可能已被重写，追加到当前代号的文件
+                self._load_index()
+                with open(self.data_path, "ab") as f:
+                    offset = f.tell()
+                    f.write(thumb.tobytes())
+                self._pending[key] = [mtime_ns, offset]
+        return thumb
+
+    def save(self) -> None:
+        """把新生成的缩略图写入索引（与其他进程的新增合并），失效图块过多时重写数据文件"""
+        with FileLock(self.lock_path):
+            with self._lock:
+                self._load_index()
+                if not self._pending:
+                    return
+                self._index.update(self._pending)
+                self._pending = {}
+                if self._should_compact():
+                    self._compact()
+                else:
+                    self._write_index()
+
+    def _should_compact(self) -> bool:
+        try:
+            size = os.path.getsize(self.data_path)
+        except OSError:
+            return False
+        dead = size - len(self._index) * self.tile_bytes
+        return (
+            size >= THUMBNAIL_COMPACT_MIN_BYTES
+            and dead >= size * THUMBNAIL_COMPACT_RATIO
+        )
+
+    def _compact(self) -> None:
+        """只保留索引引用且源图片仍存在的图块，写入下一代数据文件（须持有文件锁）"""
+        old_path = self.data_path
+        new_path = self._data_path(self._generation + 1)
+        tiles: Dict[str, List[int]] = {}
+        entries = sorted(self._index.items(), key=lambda item: item[1][1])
+        with open(new_path, "wb") as f:
+            for key, (mtime_ns, offset) in entries:
+                if not os.path.exists(key):
+                    continue
+                try:
+                    data = self.read_tile(offset)
+                except (OSError, ValueError):
+                    continue
+                tiles[key] = [mtime_ns, f.tell()]
+                f.write(data)
+        self._generation += 1
+        self._index = tiles
+        # 索引写入后新数据文件才生效，中途崩溃时旧索引与旧数据文件仍然完整
+        self._write_index()
+        self._remap()
+        try:
+            os.remove(old_path)
+        except OSError:
+            # Windows 下其他进程仍映射着旧文件时无法删除，留待下次重写
+            pass
+        print(
+            f"缩略图数据文件已整理: {len(entries)} -> {len(tiles)} 个图块，"
+            f"代号 {self._generation}"
+        )
+
+
+_stores: Dict[Tuple[str, Tuple[int, int]], ThumbnailStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_thumbnail_store(
+    cache_dir: str, thumbnail_size: Tuple[int, int]
+) -> ThumbnailStore:
+    """获取目录与尺寸对应的共享 ThumbnailStore"""
+    key = (os.path.abspath(cache_dir), tuple(thumbnail_size))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ThumbnailStore(cache_dir, thumbnail_size)
+        return store
@@ -0,0 +1,63 @@
+"""
+指令分发的单条消息开销基准：对比前缀树匹配与原先六个处理函数逐个做子串检查。
+在插件目录的上一级运行：
+    python -m <插件目录名>.tools.bench_command_router
+"""
+
+import timeit
+
+from ..command_router import MODE_PREFIX, MODE_WORD, CommandRouter
+
+# 与 main.py 中的指令表一致
+COMMANDS = {
+    "抽取老婆": MODE_WORD,
+    "牛老婆": MODE_PREFIX,
+    "查老婆": MODE_PREFIX,
+    "切换ntr状态": MODE_WORD,
+    "群老婆图鉴": MODE_WORD,
+    "老婆图鉴": MODE_WORD,
+}
+
+MESSAGES = {
+    "普通聊天": "今天晚上吃什么，有人一起去吗",
+    "含指令词的聊天": "我昨天抽取老婆抽到了一个好看的",
+    "抽取老婆": "抽取老婆",
+    "牛老婆": "牛老婆小明",
+    "老婆图鉴": "老婆图鉴 2",
+}
+
+NUMBER = 200000
+
+
+def build_router() -> CommandRouter:
+    router = CommandRouter()
+    for word, mode in COMMANDS.items():
+        router.add(word, word, mode)
+    return router
+
+
+def legacy_match(message: str):
+    # 原先六个处理函数对每条消息都会执行，各自 strip 一次再检查
+    matched = []
+    if "抽取老婆" in message.strip():
+        matched.append("抽取老婆")
+    for word in ("牛老婆", "查老婆"):
+        if message.strip().startswith(word):
+            matched.append(word)
+    for word in ("切换ntr状态", "群老婆图鉴", "老婆图鉴"):
+        if message.strip() == word:
+            matched.append(word)
+    return matched
+
+
+def main():
+    router = build_router()
+    print(f"{'消息':<12}{'前缀树(ns)':>14}{'逐个检查(ns)':>16}")
+    for name, message in MESSAGES.items():
+        trie = timeit.timeit(lambda: router.match(message), number=NUMBER)
+        legacy = timeit.timeit(lambda: legacy_match(message), number=NUMBER)
+        print(f"{name:<12}{trie * 1e9 / NUMBER:>14.0f}{legacy * 1e9 / NUMBER:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""基准脚本共用的示例数据"""
+
+import random
+
+from ..group_store import new_user_data
+
+
+def generate_group(users: int, unlocks: int) -> dict:
+    """生成 users 人、每人 unlocks 条解锁记录的群配置（同样的参数结果相同）"""
+    rng = random.Random(users)
+    config = {}
+    for i in range(users):
+        user_id = str(100000000 + i)
+        user_data = new_user_data(f"群友{i}")
+        for _ in range(unlocks):
+            name = f"角色{rng.randrange(2000)}.来源{rng.randrange(200)}.jpg"
+            user_data["unlocked"].append(
+                {"wife_name": name, "unlock_date": "2024-01-01"}
+            )
+        user_data["current"] = {
+            "wife_name": user_data["unlocked"][-1]["wife_name"],
+            "date": "2024-01-01",
+        }
+        config[user_id] = user_data
+    return config
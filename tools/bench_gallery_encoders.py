@@ -0,0 +1,90 @@
+"""
+图鉴编码配置基准：把同一张示例大图按每种编码配置编码，输出字节数与耗时。
+在插件目录的上一级运行：
+    python -m <插件目录名>.tools.bench_gallery_encoders [图片目录]
+给出图片目录时用其中的图片拼图，否则生成带噪点的示例图块。
+"""
+
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from ..anime_wife_collage import draw_tile, encode_gallery_image
+from ..wife_catalog import IMAGE_EXTENSIONS
+
+# 示例大图：每行图块数与图块数量
+PER_ROW = 10
+TILES = 200
+THUMBNAIL_SIZE = (80, 80)
+# 每种配置重复编码的次数，取平均耗时
+REPEAT = 3
+
+PROFILES = [
+    ("PNG 默认", {"format": "PNG", "compress_level": 6}),
+    ("PNG 快速", {"format": "PNG", "compress_level": 1}),
+    ("PNG 优化", {"format": "PNG", "compress_level": 9, "optimize": True}),
+    ("JPEG 85", {"format": "JPEG", "quality": 85}),
+    ("JPEG 85 渐进", {"format": "JPEG", "quality": 85, "progressive": True}),
+    ("WEBP 80", {"format": "WEBP", "quality": 80}),
+    ("WEBP 无损", {"format": "WEBP", "lossless": True}),
+]
+
+
+def _sample_tile(index: int) -> Image.Image:
+    # 渐变底色叠加噪点，接近照片类图块的压缩难度
+    rng = random.Random(index)
+    base = Image.linear_gradient("L").resize(THUMBNAIL_SIZE).rotate(rng.randrange(360))
+    noise = Image.effect_noise(THUMBNAIL_SIZE, 40)
+    return Image.merge(
+        "RGB",
+        (
+            Image.blend(base, noise, 0.3),
+            Image.blend(noise, base, 0.6).point(lambda v: v * rng.random()),
+            base.point(lambda v: 255 - v),
+        ),
+    )
+
+
+def build_sample_atlas(img_dir: str = "") -> Image.Image:
+    paths = []
+    if img_dir:
+        paths = [
+            os.path.join(img_dir, name)
+            for name in sorted(os.listdir(img_dir))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ][:TILES]
+    count = len(paths) or TILES
+    rows = (count + PER_ROW - 1) // PER_ROW
+    atlas = Image.new(
+        "RGB",
+        (PER_ROW * THUMBNAIL_SIZE[0], rows * THUMBNAIL_SIZE[1]),
+        (255, 255, 255),
+    )
+    draw = ImageDraw.Draw(atlas)
+    for i in range(count):
+        x = (i % PER_ROW) * THUMBNAIL_SIZE[0]
+        y = (i // PER_ROW) * THUMBNAIL_SIZE[1]
+        if paths:
+            draw_tile(atlas, draw, paths[i], x, y, THUMBNAIL_SIZE)
+        else:
+            atlas.paste(_sample_tile(i), (x, y))
+    return atlas
+
+
+def main():
+    atlas = build_sample_atlas(sys.argv[1] if len(sys.argv) > 1 else "")
+    print(f"示例大图 {atlas.width}x{atlas.height}")
+    print(f"{'配置':<14}{'字节':>12}{'耗时(ms)':>12}")
+    for name, profile in PROFILES:
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            payload = encode_gallery_image(atlas, profile)
+        elapsed = (time.perf_counter() - start) * 1000 / REPEAT
+        print(f"{name:<14}{len(payload):>12}{elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+群配置序列化基准：对生成的大群数据分别用 pretty / compact / msgpack 编码与解码，
+输出文件大小与耗时（未安装 orjson / msgpack 时测到的是退回后的实现）。
+在插件目录的上一级运行：
+    python -m <插件目录名>.tools.bench_serializers
+"""
+
+import time
+
+from ..serializers import (
+    MODE_COMPACT,
+    MODE_MSGPACK,
+    MODE_PRETTY,
+    dumps,
+    loads,
+    msgpack,
+    orjson,
+)
+from .bench_data import generate_group
+
+# 群人数与每人解锁数量
+GROUP_SIZES = (100, 1000, 10000)
+UNLOCKS_PER_USER = 30
+REPEAT = 3
+
+
+def _timed(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / REPEAT
+
+
+def main():
+    print(
+        f"orjson: {'已安装' if orjson else '未安装'}，msgpack: {'已安装' if msgpack else '未安装'}"
+    )
+    print(f"{'人数':>8}{'模式':>10}{'大小(KB)':>12}{'保存(ms)':>12}{'加载(ms)':>12}")
+    for users in GROUP_SIZES:
+        config = generate_group(users, UNLOCKS_PER_USER)
+        for mode in (MODE_PRETTY, MODE_COMPACT, MODE_MSGPACK):
+            payload = dumps(config, mode)
+            assert loads(payload) == config
+            save_ms = _timed(dumps, config, mode)
+            load_ms = _timed(loads, payload)
+            print(
+                f"{users:>8}{mode:>10}{len(payload) / 1024:>12.1f}"
+                f"{save_ms:>12.1f}{load_ms:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
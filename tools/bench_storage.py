@@ -0,0 +1,92 @@
+"""
+存储后端基准：同一个群在 JSON 与 SQLite 后端下的加载与单次修改耗时。
+每次修改为新用户抽老婆（ensure_user + set_current + record_unlock + save），
+JSON 后端按立即写入模式落盘（整群重写），SQLite 后端逐行写入。
+在插件目录的上一级运行：
+    python -m <插件目录名>.tools.bench_storage
+"""
+
+import os
+import tempfile
+import time
+
+from ..group_store import GroupStore, JsonGroupBackend
+from ..persistence import MODE_WRITE_THROUGH, WriteBehindWriter, encode_json
+from ..sqlite_backend import SqliteBackend
+from .bench_data import generate_group
+
+# 群人数、每人解锁数量与测量的修改次数
+GROUP_SIZES = (100, 10000, 100000)
+UNLOCKS_PER_USER = 5
+UPDATES = 20
+GROUP_ID = "10000"
+
+
+def _measure(store: GroupStore) -> tuple:
+    """返回 (冷加载耗时, 平均每次修改耗时)，单位毫秒"""
+    start = time.perf_counter()
+    config = store.load(GROUP_ID)
+    load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        user_id = f"new{i}"
+        store.ensure_user(GROUP_ID, user_id, "新用户")
+        store.set_current(GROUP_ID, user_id, f"角色{i}.jpg", "2024-01-02")
+        store.record_unlock(GROUP_ID, user_id, f"角色{i}.jpg", "2024-01-02")
+        store.save(GROUP_ID, config)
+    update_ms = (time.perf_counter() - start) * 1000 / UPDATES
+    return load_ms, update_ms
+
+
+def bench(users: int, workdir: str) -> None:
+    config_dir = os.path.join(workdir, str(users))
+    os.makedirs(config_dir)
+    group_path = os.path.join(config_dir, f"{GROUP_ID}.json")
+    with open(group_path, "wb") as f:
+        f.write(encode_json(generate_group(users, UNLOCKS_PER_USER)))
+    json_size = os.path.getsize(group_path)
+
+    writer = WriteBehindWriter(mode=MODE_WRITE_THROUGH)
+    json_store = GroupStore(
+        config_dir, writer=writer, backend=JsonGroupBackend(config_dir, writer)
+    )
+    json_load, json_update = _measure(json_store)
+
+    # 迁移在 JSON 测量之前的数据上进行
+    with open(group_path, "wb") as f:
+        f.write(encode_json(generate_group(users, UNLOCKS_PER_USER)))
+    db_path = os.path.join(workdir, f"{users}.db")
+    backend = SqliteBackend(db_path)
+    start = time.perf_counter()
+    backend.migrate_from_json(
+        config_dir,
+        os.path.join(config_dir, "ntr_status.json"),
+        os.path.join(config_dir, "ntr_limit.json"),
+    )
+    migrate_ms = (time.perf_counter() - start) * 1000
+    sqlite_store = GroupStore(config_dir, writer=writer, backend=backend)
+    sqlite_load, sqlite_update = _measure(sqlite_store)
+    backend.close()
+
+    print(
+        f"{users:>8}{'json':>8}{json_size / 1024:>12.0f}{json_load:>12.1f}"
+        f"{json_update:>12.2f}{'':>12}"
+    )
+    print(
+        f"{users:>8}{'sqlite':>8}{os.path.getsize(db_path) / 1024:>12.0f}"
+        f"{sqlite_load:>12.1f}{sqlite_update:>12.2f}{migrate_ms:>12.1f}"
+    )
+
+
+def main():
+    print(
+        f"{'人数':>8}{'后端':>8}{'大小(KB)':>12}{'加载(ms)':>12}"
+        f"{'修改(ms)':>12}{'迁移(ms)':>12}"
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        for users in GROUP_SIZES:
+            bench(users, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+远程图片请求的本地替身测试：启动一个 aiohttp.web 替身图床，检查
+1. 连续请求复用同一个 keep-alive 连接
+2. 响应过慢时按超时失败，并按重试次数重试
+3. 5xx 响应会重试，重试后成功即返回
+4. 远程列表用 ETag 条件请求刷新，未变化时服务端返回 304，列表保持不变
+无需联网，在插件目录的上一级运行：
+    python -m <插件目录名>.tools.check_http_client
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from aiohttp import web
+
+from ..http_client import AsyncHttpClient
+from ..remote_catalog import RemoteCatalog
+
+# 替身图床的图片列表
+NAMES = [f"角色{i}.来源.jpg" for i in range(5)]
+# 替身图床图片列表的 ETag
+ETAG = '"names-v1"'
+# 客户端超时（秒），/slow 的响应时间超过它
+TIMEOUT = 0.5
+
+
+class StandInServer:
+    """替身图床，记录每个路径的请求次数与用过的客户端连接"""
+
+    def __init__(self):
+        self.hits = {}
+        self.peers = set()
+        self.runner = None
+        self.base_url = ""
+
+    def _record(self, request: web.Request) -> None:
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+
+    async def list_names(self, request: web.Request) -> web.Response:
+        self._record(request)
+        if request.headers.get("If-None-Match") == ETAG:
+            self.hits["304"] = self.hits.get("304", 0) + 1
+            return web.Response(status=304, headers={"ETag": ETAG})
+        return web.Response(text="\n".join(NAMES), headers={"ETag": ETAG})
+
+    async def slow(self, request: web.Request) -> web.Response:
+        self._record(request)
+        await asyncio.sleep(TIMEOUT * 4)
+        return web.Response(text="too late")
+
+    async def flaky(self, request: web.Request) -> web.Response:
+        # 第一次返回 503，之后正常
+        self._record(request)
+        if self.hits[request.path] == 1:
+            return web.Response(status=503)
+        return web.Response(text="ok")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/list/", self.list_names)
+        app.router.add_get("/slow", self.slow)
+        app.router.add_get("/flaky", self.flaky)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+async def run() -> list:
+    errors = []
+    server = StandInServer()
+    await server.start()
+    client = AsyncHttpClient(timeout=TIMEOUT, retries=1, backoff=0.01)
+    try:
+        for _ in range(10):
+            response = await client.request(server.base_url + "/list/")
+            if response.status != 200 or response.text.splitlines() != NAMES:
+                errors.append(f"图片列表响应不正确: {response.status}")
+        if len(server.peers) != 1:
+            errors.append(f"10 次请求用了 {len(server.peers)} 个连接，连接未复用")
+
+        try:
+            await client.request(server.base_url + "/slow")
+            errors.append("慢响应没有超时")
+        except asyncio.TimeoutError:
+            pass
+        if server.hits.get("/slow") != 2:
+            errors.append(f"超时后应重试 1 次，实际请求 {server.hits.get('/slow')} 次")
+
+        response = await client.request(server.base_url + "/flaky")
+        if response.status != 200 or server.hits.get("/flaky") != 2:
+            errors.append(
+                f"5xx 重试不正确: 状态 {response.status}，"
+                f"请求 {server.hits.get('/flaky')} 次"
+            )
+
+        errors.extend(await check_catalog(server, client))
+    finally:
+        await client.close()
+        await server.stop()
+    return errors
+
+
+async def check_catalog(server: StandInServer, client: AsyncHttpClient) -> list:
+    errors = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cache_path = os.path.join(workdir, "remote_catalog.json")
+        # ttl 为 0，每次 refresh 都会发出条件请求
+        catalog = RemoteCatalog(server.base_url + "/list/", cache_path, client, ttl=0)
+        if await catalog.get_names() != NAMES:
+            errors.append("冷启动没有取到图片列表")
+        await catalog.refresh()
+        if server.hits.get("304") != 1 or catalog.names != NAMES:
+            errors.append(
+                f"条件请求不正确: 304 次数 {server.hits.get('304')}，"
+                f"列表 {len(catalog.names)} 项"
+            )
+        # 重启后从磁盘缓存读取，不访问图床
+        requests = server.hits["/list/"]
+        restarted = RemoteCatalog(server.base_url + "/list/", cache_path, client)
+        if await restarted.get_names() != NAMES or server.hits["/list/"] != requests:
+            errors.append("重启后没有使用磁盘上的图片列表")
+    return errors
+
+
+def main():
+    errors = asyncio.run(run())
+    for error in errors:
+        print(error)
+    print("通过" if not errors else "失败")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
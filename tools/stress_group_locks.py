@@ -0,0 +1,190 @@
+"""
+群锁压力测试：向同一个群并发发送数千条抽老婆/牛老婆指令，检查
+1. 并发抽取时每个用户当天只抽到一个老婆
+2. 每个用户的 unlocked 列表没有重复
+3. 每个用户每天的 NTR 次数不超过 _ntr_max
+远程图片列表由桩代替，不访问网络；桩在返回前让出事件循环，锁内存在真实的挂起点。
+随后在另一个群上绕过群锁重复一遍，确认测试能发现竞争（应当报告问题）。
+需要在装有 AstrBot 的环境中，于插件目录的上一级运行：
+    python -m <插件目录名>.tools.stress_group_locks
+数据写在临时目录中，不影响插件的真实数据。
+"""
+
+import asyncio
+import importlib
+import os
+import random
+import sys
+import tempfile
+
+from astrbot.api.all import At
+
+# 每个阶段的并发事件数量与参与的用户数量
+EVENTS = 1500
+USERS = 50
+GROUP_ID = "10000"
+# 绕过群锁做对照的群
+BYPASS_GROUP_ID = "10001"
+# 桩图床返回的图片名
+REMOTE_NAMES = [f"角色{i}.来源.jpg" for i in range(20)]
+
+
+class _Message:
+    def __init__(self, group_id, components):
+        self.group_id = group_id
+        self.message = components
+
+
+class StubEvent:
+    """只实现插件用到的事件接口"""
+
+    def __init__(self, group_id, user_id, text, at=None):
+        self.message_str = text
+        self.message_obj = _Message(group_id, [At(qq=at)] if at else [])
+        self._user_id = user_id
+
+    def get_sender_id(self):
+        return self._user_id
+
+    def get_sender_name(self):
+        return f"用户{self._user_id}"
+
+    def plain_result(self, text):
+        return text
+
+    def chain_result(self, chain):
+        return chain
+
+
+class _StubResponse:
+    def __init__(self, status, body=b""):
+        self.status = status
+        self.headers = {}
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8")
+
+
+class StubImageHost:
+    """
+    代替图床：图片列表返回 REMOTE_NAMES，图片本身返回 404。
+    每次获取列表都让出一次事件循环，抽取在锁内等待图片列表时其他指令得以穿插执行。
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    async def get_names(self):
+        # 代替 remote_catalog.get_names：已缓存的列表本不需要等待，这里强制让出
+        await asyncio.sleep(0)
+        return list(REMOTE_NAMES)
+
+    async def request(self, url, headers=None):
+        await asyncio.sleep(0)
+        if url == self.base_url:
+            return _StubResponse(200, "\n".join(REMOTE_NAMES).encode("utf-8"))
+        return _StubResponse(404)
+
+
+class _NoLock:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+async def _send(plugin, event):
+    async for _ in plugin.dispatch(event):
+        pass
+
+
+async def _draws(plugin, group_id):
+    # 同一用户的多次抽取并发进行
+    events = [
+        StubEvent(group_id, str(random.randrange(USERS)), "抽取老婆")
+        for _ in range(EVENTS)
+    ]
+    await asyncio.gather(*(_send(plugin, event) for event in events))
+
+
+async def _mixed(plugin, group_id):
+    events = []
+    for _ in range(EVENTS):
+        user_id = str(random.randrange(USERS))
+        if random.random() < 0.5:
+            events.append(StubEvent(group_id, user_id, "抽取老婆"))
+        else:
+            target = str(random.randrange(USERS))
+            events.append(StubEvent(group_id, user_id, "牛老婆", at=target))
+    await asyncio.gather(*(_send(plugin, event) for event in events))
+
+
+async def run(main, plugin, group_id):
+    """在 group_id 上依次执行两个阶段，返回发现的问题"""
+    errors = []
+    await _draws(plugin, group_id)
+    for user_id, user_data in main.load_group_config(group_id).items():
+        if len(user_data["unlocked"]) != 1:
+            names = [item["wife_name"] for item in user_data["unlocked"]]
+            errors.append(f"用户 {user_id} 并发抽取得到多个老婆: {names}")
+
+    main.ntr_statuses[group_id] = True
+    await _mixed(plugin, group_id)
+    config = main.load_group_config(group_id)
+    for user_id, user_data in config.items():
+        names = [item["wife_name"] for item in user_data["unlocked"]]
+        if len(names) != len(set(names)):
+            errors.append(f"用户 {user_id} 的解锁记录重复: {names}")
+    ntr_total = 0
+    for user_id, dates in main.ntr_limits.get(group_id, {}).items():
+        for date, count in dates.items():
+            ntr_total += count
+            if count > main._ntr_max:
+                errors.append(f"用户 {user_id} 在 {date} 牛了 {count} 次")
+    print(
+        f"群 {group_id}：事件 {EVENTS * 2} 条，用户 {len(config)} 个，"
+        f"NTR 计数合计 {ntr_total}，问题 {len(errors)} 个"
+    )
+    return errors
+
+
+async def main_async(main):
+    host = StubImageHost(main.IMAGE_BASE_URL)
+    main.http_client.request = host.request
+    main.remote_catalog.get_names = host.get_names
+    main.ntr_possibility = 0.5
+    plugin = main.WifePlugin(None)
+    await plugin.initialize()
+    errors = await run(main, plugin, GROUP_ID)
+    for error in errors[:20]:
+        print(error)
+
+    # 对照：不加锁时应当出现问题，否则说明测试无法发现竞争
+    main.group_store.lock = lambda group_id: _NoLock()
+    bypass_errors = await run(main, plugin, BYPASS_GROUP_ID)
+    del main.group_store.lock
+    if not bypass_errors:
+        print("绕过群锁后没有发现问题，测试无法发现竞争")
+    await plugin.terminate()
+    return not errors and bool(bypass_errors)
+
+
+def entry():
+    tools_dir = os.path.dirname(os.path.abspath(__file__))
+    plugin_dir = os.path.dirname(tools_dir)
+    package = (__package__ or "").rpartition(".")[0] or os.path.basename(plugin_dir)
+    sys.path.insert(0, os.path.dirname(plugin_dir))
+    with tempfile.TemporaryDirectory() as workdir:
+        # 插件的数据目录是相对当前目录的，须在导入前切换
+        os.chdir(workdir)
+        main = importlib.import_module(f"{package}.main")
+        ok = asyncio.run(main_async(main))
+    print("通过" if ok else "失败")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    entry()
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 支持的图片扩展名：抽老婆与图鉴都只使用这些文件，
+# 目录中没有任何此类文件时改为从图床获取
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+# 两次检查目录修改时间的最小间隔（秒）
+CATALOG_CHECK_INTERVAL = 5.0
+
+
+def parse_wife_name(wife_name: str) -> (str, str):
+    """
+    解析图片名字，提取角色名和来源
+    支持两种格式：
+    1. 来源.角色名.jpg
+    2. 角色名.jpg/png
+    """
+    parts = wife_name.split(".")
+    if len(parts) >= 3:
+        # 新格式：来源.角色名.jpg
+        source = parts[0]
+        name = parts[1]
+    else:
+        # 旧格式：角色名.jpg/png 或 角色名.png
+        name = parts[0]
+        source = "未知"
+    return name, source
+
+
+class CatalogSnapshot:
+    """某一时刻的图片目录索引，创建后不再修改，可在线程间共享"""
+
+    def __init__(self, names: List[str], version: int):
+        # 按文件名排序的图片列表
+        self.names = names
+        # 与 names 一一对应的 (角色名, 来源)
+        self.parsed: List[Tuple[str, str]] = [parse_wife_name(n) for n in names]
+        # 文件名 -> 下标
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.version = version
+        # 图片列表的内容摘要，version 只在本进程内有意义，跨进程比较用它
+        digest = hashlib.sha1()
+        for name in names:
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+        self.fingerprint = digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, wife_name: str) -> bool:
+        return wife_name in self.index
+
+
+class WifeCatalog:
+    """
+    本地图片目录的共享索引：
+    启动时扫描一次，之后仅在目录修改时间变化时重新扫描，
+    且每 check_interval 秒最多检查一次修改时间。
+    事件循环中通过 get_snapshot 获取，扫描在线程池中进行，完成后整体替换索引。
+    """
+
+    def __init__(self, img_dir: str, check_interval: float = CATALOG_CHECK_INTERVAL):
+        self.img_dir = img_dir
+        self.check_interval = check_interval
+        self._snapshot = CatalogSnapshot([], 0)
+        self._mtime_ns: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # 线程池中正在进行的扫描
+        self._refresh_future: Optional[asyncio.Future] = None
+
+    def _scan(self) -> List[str]:
+        if not os.path.exists(self.img_dir):
+            return []
+        return sorted(
+            entry.name
+            for entry in os.scandir(self.img_dir)
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+
+    def refresh(self, force: bool = False) -> bool:
+        """目录有变化（或 force）时重建索引，返回是否重建"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime_ns = os.stat(self.img_dir).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if not force and mtime_ns == self._mtime_ns:
+                return False
+            self._mtime_ns = mtime_ns
+            self._snapshot = CatalogSnapshot(self._scan(), self._snapshot.version + 1)
+            return True
+
+    def snapshot(self) -> CatalogSnapshot:
+        """返回当前缓存的索引，不访问文件系统"""
+        return self._snapshot
+
+    def _is_stale(self) -> bool:
+        return (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= self.check_interval
+        )
+
+    def _schedule_refresh(self) -> asyncio.Future:
+        if self._refresh_future is None or self._refresh_future.done():
+            loop = asyncio.get_running_loop()
+            self._refresh_future = loop.run_in_executor(None, self.refresh)
+        return self._refresh_future
+
+    async def get_snapshot(self) -> CatalogSnapshot:
+        """
+        在事件循环中获取索引。
+        尚未扫描过时等待首次扫描；索引过期时在线程池中重新检查目录，
+        本次先返回旧索引，扫描完成后由后续调用取得新索引。
+        """
+        if self._checked_at is None:
+            await self._schedule_refresh()
+        elif self._is_stale():
+            self._schedule_refresh()
+        return self._snapshot
+
+    def checked_snapshot(self, expected: Optional[str] = None) -> CatalogSnapshot:
+        """
+        同步获取索引，必要时先检查目录是否变化，只在渲染进程或线程池中调用。
+        给出 expected（其他进程中索引的 fingerprint）且与本进程不一致时立即重新扫描。
+        """
+        if self._is_stale():
+            self.refresh()
+        if expected is not None and self._snapshot.fingerprint != expected:
+            self.refresh(force=True)
+        return self._snapshot
+
+
+_catalogs: Dict[str, WifeCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_wife_catalog(img_dir: str) -> WifeCatalog:
+    """获取图片目录对应的共享 WifeCatalog，同一目录全进程只有一个实例"""
+    key = os.path.abspath(img_dir)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = WifeCatalog(img_dir)
+        return catalog